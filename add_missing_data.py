@@ -1,9 +1,12 @@
 import pandas as pd
 import os
 import torch
-from transformers import pipeline
 from tqdm import tqdm
 import warnings
+from table_io import find_tables, read_table
+from id_set import scored_ids, drop_seen
+from onnx_backend import load_classifier
+from token_windows import score_windows
 warnings.filterwarnings('ignore')
 
 INPUT_DIR = r"D:\Lyrics-Fanbase-Correlator\Processed_Artist_Data"
@@ -33,8 +36,8 @@ ARTIST_MAP = {
 device = 0 if torch.cuda.is_available() else -1
 
 print("Loading GoEmotions AI Model...")
-classifier = pipeline(
-    task="text-classification", 
+# torch by default; EMOTION_BACKEND=onnx / onnx-int8 runs it on ONNX Runtime (onnx_backend.py)
+classifier = load_classifier(
     model="SamLowe/roberta-base-go_emotions", 
     top_k=None, 
     device=device,
@@ -50,10 +53,8 @@ def process_missing_files():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
         
-    files_to_process = []
-    for f in os.listdir(INPUT_DIR):
-        if any(f.endswith(ending) for ending in TARGET_ENDINGS):
-            files_to_process.append(f)
+    # matches the compressed / parquet versions of the same files too
+    files_to_process = find_tables(INPUT_DIR, TARGET_ENDINGS)
             
     if not files_to_process:
         print("No MASTER or COMMENTS files found in the directory.")
@@ -65,7 +66,7 @@ def process_missing_files():
         input_path = os.path.join(INPUT_DIR, file_name)
         
         try:
-            df = pd.read_csv(input_path)
+            df = read_table(input_path)
         except Exception as e:
             print(f"Error reading {file_name}: {e}")
             continue
@@ -92,16 +93,31 @@ def process_missing_files():
         if df.empty:
             print(f"No valid text rows left in {file_name}. Skipping.")
             continue
+
+        out_name = f"{artist_name}_FullDist.csv"
+        out_path = os.path.join(OUTPUT_DIR, out_name)
+
+        # anything already in the FullDist file (from any script, any run) isn't scored again
+        ids = scored_ids(OUTPUT_DIR, out_name)
+        before = len(df)
+        df = drop_seen(df, ids)
+        if df.empty:
+            print(f"All {before} rows in {file_name} are already in {out_name}. Skipping.")
+            ids.close()
+            continue
+        keys = df.pop('_key').tolist()
             
-        print(f"Running AI on {len(df)} posts for {artist_name}...")
+        print(f"Running AI on {len(df)} posts for {artist_name} ({before - len(df)} already scored)...")
         
         texts = df[text_col].tolist()
-        batch_size = 100
+        # rows per call; the classifier re-batches them by token length
+        batch_size = 2000
         all_results = []
         
         for i in tqdm(range(0, len(texts), batch_size)):
             batch = texts[i:i+batch_size]
-            results = classifier(batch)
+            # long posts are scored over token windows instead of being truncated at 512
+            results, _ = score_windows(classifier, batch)
             
             for res in results:
                 emotion_dict = {score['label']: score['score'] for score in res}
@@ -110,15 +126,17 @@ def process_missing_files():
         emotions_df = pd.DataFrame(all_results)
         final_df = pd.concat([df.reset_index(drop=True), emotions_df.reset_index(drop=True)], axis=1)
         
-        out_name = f"{artist_name}_FullDist.csv"
-        out_path = os.path.join(OUTPUT_DIR, out_name)
-        
         # safely append to the bottom of the existing file without overwriting
         # if the file doesn't exist yet, it will create it and write the headers
         file_exists = os.path.exists(out_path)
         final_df.to_csv(out_path, mode='a', header=not file_exists, index=False)
+        # only once the rows are on disk
+        ids.add_all(keys)
+        ids.commit()
+        ids.close()
         
         print(f"Successfully appended {len(final_df)} new rows to {out_name}")
+        classifier.report()
 
 if __name__ == "__main__":
     process_missing_files()
\ No newline at end of file
@@ -1,60 +1,140 @@
 import os
+import re
 import sys
 import csv
-import json
+import time
 import tempfile
 import shutil
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from dump_filters import AUTHOR_KEYS, loads, has_author_key, anonymize_line_fast, anonymize_line_json
+from time_index import ZSTD_MAGIC, dict_path, read_index_meta, reencode_seekable, open_lines
 
 # CONFIGURATION
 RAW_DIR_NAME = "raw"
-TARGET_KEYS = ["author", "author_fullname", "username"]  # Keys to NUKE
+TARGET_KEYS = list(AUTHOR_KEYS)  # Keys to NUKE (same list the extractors drop inline)
+SIDECAR_SUFFIXES = (".tidx", ".dict", ".npz", ".ckpt", ".tmp")  # index/dictionary files, not data
+
+# Files are cleaned on a process pool; JSONL files bigger than CHUNK_BYTES are
+# split on line boundaries so one huge dump doesn't run on a single core.
+# python anonymize.py 8   -> 8 workers
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# a target key followed by a colon anywhere outside quoted text - it only
+# picks which lines verify_clean() decodes (plus any line with a \u escape,
+# since a key name can be spelled that way)
+_MENTION_RE = re.compile(rb'(?<!\\)"(?:' + b"|".join(k.encode() for k in AUTHOR_KEYS) + rb')"\s*:|\\u')
 
 def get_raw_dir():
     # Finds the 'raw' folder relative to this script
     return Path(__file__).resolve().parent / RAW_DIR_NAME
 
-def clean_jsonl_stream(input_path, temp_path):
+def clean_line(line, stats):
+    """
+    One JSONL line -> anonymized bytes (None to drop it). Byte-level cut
+    first, verified by decoding the result once; anything that doesn't come
+    out as valid JSON without author keys (odd values, \\u-escaped key
+    names, broken lines) goes through the full json path, which drops
+    lines that aren't JSON at all.
+    """
+    out = anonymize_line_fast(line)
+    if out is not None:
+        stats["fast"] += 1
+        return out
+    stats["fallback"] += 1
+    out = anonymize_line_json(line)
+    if out is None:
+        stats["dropped"] += 1
+    return out
+
+def _new_stats():
+    return {"fast": 0, "fallback": 0, "dropped": 0, "bytes": 0}
+
+def clean_jsonl_stream(input_path, temp_path, stats=None):
     """
     Reads JSONL line-by-line, removes author, writes to temp.
     Returns True if successful, False if it wasn't valid JSONL.
     """
+    stats = stats if stats is not None else _new_stats()
     try:
-        with open(input_path, 'r', encoding='utf-8', errors='replace') as fin, \
-             open(temp_path, 'w', encoding='utf-8', newline='\n') as fout:
+        with open(input_path, 'rb') as fin, open(temp_path, 'wb') as fout:
             
             first_line = True
             for line in fin:
+                stats["bytes"] += len(line)
                 line = line.strip()
                 if not line: continue
                 
-                try:
-                    data = json.loads(line)
-                    
-                    # Heuristic: If the first line isn't a dict, it's probably not the data we want
-                    if first_line:
-                        if not isinstance(data, dict):
+                # Heuristic: If the first line isn't a JSON object, it's probably not the data we want
+                if first_line:
+                    try:
+                        if not isinstance(loads(line), dict):
                             return False
-                        first_line = False
-
-                    # NUKE THE KEYS
-                    for key in TARGET_KEYS:
-                        data.pop(key, None)
-                    
-                    # Write back to temp
-                    fout.write(json.dumps(data) + "\n")
-                    
-                except json.JSONDecodeError:
-                    # If the very first line fails, it's not JSONL. Abort.
-                    if first_line:
+                    except ValueError:
                         return False
-                    # If a middle line fails, skip it (corrupt data)
-                    continue
+                    first_line = False
+
+                # NUKE THE KEYS (corrupt lines come back as None and get skipped)
+                out = clean_line(line, stats)
+                if out is not None:
+                    fout.write(out)
         return True
     except Exception as e:
         print(f"  [JSONL Fail] {e}")
         return False
 
+def _chunk_bounds(path, chunk_bytes=CHUNK_BYTES):
+    """Splits a file into ~chunk_bytes byte ranges that start and end on line boundaries."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        while bounds[-1] + chunk_bytes < size:
+            f.seek(bounds[-1] + chunk_bytes)
+            f.readline()
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _clean_chunk(path, start, end, part_path):
+    # worker: one byte range of a JSONL file -> its own part file
+    stats = _new_stats()
+    with open(path, 'rb') as fin, open(part_path, 'wb') as fout:
+        fin.seek(start)
+        while fin.tell() < end:
+            line = fin.readline()
+            if not line:
+                break
+            stats["bytes"] += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            out = clean_line(line, stats)
+            if out is not None:
+                fout.write(out)
+    return stats
+
+def _detect(path):
+    with open(path, 'rb') as f:
+        if f.read(4) == ZSTD_MAGIC:
+            return "zst"
+        f.seek(0)
+        for line in f:
+            if line.strip():
+                try:
+                    return "jsonl" if isinstance(loads(line), dict) else "other"
+                except ValueError:
+                    return "other"
+    return "other"
+
+def _whole_file(path):
+    # worker: zst archives and CSVs go through the single-file path
+    t0 = time.time()
+    process_file_force(Path(path))
+    return {**_new_stats(), "bytes": os.path.getsize(path), "secs": time.time() - t0}
+
 def clean_csv_stream(input_path, temp_path):
     """
     Reads CSV, removes author column, writes to temp.
@@ -94,8 +174,37 @@ def clean_csv_stream(input_path, temp_path):
         print(f"  [CSV Fail] {e}")
         return False
 
+def clean_zst_archive(file_path):
+    """
+    Rewrites a .zst (a seekable raw/ archive or a plain dump) in place with the
+    keys removed. Keeps the archive's dictionary and settings so every reader
+    still opens it the same way.
+    """
+    meta = read_index_meta(file_path) or {}
+    try:
+        reencode_seekable(str(file_path), str(file_path), dict_file=dict_path(file_path, meta), anonymize=True)
+        return True
+    except Exception as e:
+        print(f"  [ZST Fail] {e}")
+        tmp = str(file_path) + ".tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
 def process_file_force(file_path):
     print(f"Processing: {file_path.name}...")
+
+    with open(file_path, 'rb') as f:
+        is_zst = f.read(4) == ZSTD_MAGIC
+    if is_zst and (read_index_meta(file_path) or {}).get("anonymized"):
+        # archived by time_index.py --archive, authors were dropped on the way in
+        print(f"  -> zstd archive was anonymized when it was written. Skipping.")
+        return
+    if is_zst:
+        # compressed archive: stream it through the same key removal, no temp JSONL
+        if clean_zst_archive(file_path):
+            print(f"  -> Detected zstd archive. Anonymized.")
+        return
     
     # Create a temp file to write cleaned data to
     fd, temp_path = tempfile.mkstemp(dir=file_path.parent, text=True)
@@ -129,6 +238,90 @@ def process_file_force(file_path):
             print(f"  Error overwriting file: {e}")
             os.remove(temp_path)
 
+def anonymize_parallel(paths, workers=WORKERS, chunk_bytes=CHUNK_BYTES):
+    """
+    Anonymizes paths across a process pool. Big JSONL files are split into
+    chunk_bytes pieces that are cleaned side by side and stitched back
+    together in order; .zst archives and CSVs are one task each. A file is
+    only replaced once all of its pieces came back clean.
+    """
+    t_start = time.time()
+    jobs = {}   # path -> [futures], in order
+    report = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path in paths:
+            path = str(path)
+            kind = _detect(path)
+            if kind == "jsonl":
+                d, name = os.path.split(path)
+                jobs[path] = []
+                for i, (a, b) in enumerate(_chunk_bounds(path, chunk_bytes)):
+                    part = os.path.join(d, f".{name}.part{i:04d}")
+                    jobs[path].append((part, pool.submit(_clean_chunk, path, a, b, part)))
+            else:
+                jobs[path] = [(None, pool.submit(_whole_file, path))]
+
+        for path, pieces in jobs.items():
+            stats = _new_stats()
+            try:
+                for _, fut in pieces:
+                    for k, v in fut.result().items():
+                        if k in stats:
+                            stats[k] += v
+                if pieces[0][0] is not None:
+                    print(f"Processing: {os.path.basename(path)} ({len(pieces)} chunks)...")
+                    tmp = path + ".tmp"
+                    with open(tmp, 'wb') as out:
+                        for part, _ in pieces:
+                            with open(part, 'rb') as f:
+                                shutil.copyfileobj(f, out, 16 * 1024 * 1024)
+                    os.replace(tmp, path)
+                    print(f"  -> Detected JSONL. Anonymized.")
+            except Exception as e:
+                print(f"  [FAIL] {os.path.basename(path)}: {e} (left untouched)")
+                stats = None
+            finally:
+                for part, _ in pieces:
+                    if part and os.path.exists(part):
+                        os.remove(part)
+            if stats is not None:
+                report[path] = (stats, time.time() - t_start)
+
+    # throughput: MB/s is per file from the start of the run (they all run at
+    # once), the total line is what matters
+    total = sum(st["bytes"] for st, _ in report.values())
+    secs = max(time.time() - t_start, 1e-9)
+    print("\n--- ANONYMIZE REPORT ---")
+    for path, (st, done_at) in sorted(report.items()):
+        mb = st["bytes"] / 1024**2
+        print(f"{os.path.basename(path):<36} {mb:>9.1f}MB  fast: {st['fast']:>10}  json: {st['fallback']:>7}  "
+              f"dropped: {st['dropped']:>5}  done at {done_at:6.1f}s")
+    print(f"{len(report)} files, {total / 1024**2:.1f}MB in {secs:.1f}s = {total / 1024**2 / secs:.1f}MB/s "
+          f"on {workers} workers")
+    return report
+
+def verify_clean(path):
+    """True if no line of path (plain or .zst) has a target key at any depth."""
+    with open_lines(str(path)) as f:
+        for line in f:
+            if _MENTION_RE.search(line):
+                try:
+                    if has_author_key(loads(line)):
+                        return False
+                except ValueError:
+                    continue
+    return True
+
+def _targets(raw_dir):
+    for entry in os.scandir(raw_dir):
+        if entry.is_file():
+            # Skip hidden files or the script itself if it's in there
+            if entry.name.startswith(".") or entry.name.endswith(".py"):
+                continue
+            if entry.name.endswith(SIDECAR_SUFFIXES):
+                continue
+            yield entry.path
+
 def main():
     raw_dir = get_raw_dir()
     
@@ -136,25 +329,19 @@ def main():
         print(f"ERROR: Could not find 'raw' directory at: {raw_dir}")
         return
 
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else WORKERS
     print(f"Scanning directory: {raw_dir}")
     print("------------------------------------------------")
 
-    files_processed = 0
-    
-    # Iterate over ALL files in the directory
-    for entry in os.scandir(raw_dir):
-        if entry.is_file():
-            # Skip hidden files or the script itself if it's in there
-            if entry.name.startswith("."): 
-                continue
-            if entry.name.endswith(".py"): 
-                continue
-            
-            process_file_force(Path(entry.path))
-            files_processed += 1
-            
+    paths = sorted(_targets(raw_dir), key=os.path.getsize, reverse=True)
+    anonymize_parallel(paths, workers)
+
+    # independent check on what's on disk now
+    leaks = [p for p in paths if os.path.exists(p) and _detect(p) in ("jsonl", "zst") and not verify_clean(p)]
     print("------------------------------------------------")
-    print(f"Done. Processed {files_processed} files.")
+    if leaks:
+        print(f"WARNING: author keys still in {len(leaks)} files: {', '.join(os.path.basename(p) for p in leaks)}")
+    print(f"Done. Processed {len(paths)} files.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
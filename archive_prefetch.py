@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import shutil
+import queue
+import threading
+
+# Overlaps "get month N+1" with "extract month N".
+#
+# The Colab loop does acquire -> extract -> wipe -> acquire... one after the
+# other, but acquiring is disk/network bound and extracting is CPU bound, so
+# they can run side by side. A background thread stages upcoming archives
+# into stage_dir/<task name>/ while the caller chews through the current one.
+# Each staged archive is deleted as soon as the caller moves on from it.
+#
+# Disk budget: before staging the next archive we wait until
+#   bytes currently staged + expected size of the next one <= budget_bytes
+# The expected size comes from size_hint(task) if given, otherwise the
+# biggest archive we've staged so far. If nothing is staged at all we always
+# go ahead (otherwise one oversized archive would deadlock the run).
+#
+# fetch(task, dest_dir) does the actual acquiring. local_fetcher() copies
+# from a local folder, which is also how this gets tested without aria2c.
+
+COPY_BUFFER = 16 * 1024 * 1024
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+def task_name(task, i):
+    if isinstance(task, dict):
+        return str(task.get("name") or task.get("month") or i)
+    return str(task)
+
+
+def local_fetcher(source_dir, files_key="files"):
+    """
+    fetch() that copies task[files_key] (file names in source_dir) into the
+    stage dir. Returns (fetch, size_hint).
+    """
+    def files_for(task):
+        names = task[files_key] if isinstance(task, dict) else [task]
+        return [os.path.join(source_dir, n) for n in names]
+
+    def fetch(task, dest_dir):
+        for src in files_for(task):
+            dst = os.path.join(dest_dir, os.path.basename(src))
+            with open(src, 'rb') as fin, open(dst + ".part", 'wb') as fout:
+                shutil.copyfileobj(fin, fout, COPY_BUFFER)
+            # .part -> real name only once it's complete
+            os.replace(dst + ".part", dst)
+
+    def size_hint(task):
+        return sum(os.path.getsize(p) for p in files_for(task) if os.path.exists(p))
+
+    return fetch, size_hint
+
+
+class PrefetchScheduler:
+    """
+    for task, staged_dir in PrefetchScheduler(TASKS, fetch, "/content/stage", 80 * 1024**3):
+        process(staged_dir)
+    # staged_dir is deleted when the loop asks for the next task
+    """
+
+    def __init__(self, tasks, fetch, stage_dir, budget_bytes, size_hint=None, lookahead=1):
+        self.tasks = list(tasks)
+        self.fetch = fetch
+        self.stage_dir = stage_dir
+        self.budget_bytes = budget_bytes
+        self.size_hint = size_hint
+        self.ready = queue.Queue(maxsize=max(1, lookahead))
+        self.cond = threading.Condition()
+        self.staged_bytes = 0
+        self.largest = 0
+        self.stop = threading.Event()
+        self.stats = []     # one dict per task: fetch_seconds, wait_seconds, bytes
+        self.thread = None
+
+    def _expected(self, task):
+        if self.size_hint:
+            try:
+                return self.size_hint(task)
+            except Exception:
+                pass
+        return self.largest
+
+    def _worker(self):
+        try:
+            for i, task in enumerate(self.tasks):
+                need = self._expected(task)
+                with self.cond:
+                    while (self.staged_bytes > 0 and self.staged_bytes + need > self.budget_bytes
+                           and not self.stop.is_set()):
+                        self.cond.wait(timeout=1.0)
+                if self.stop.is_set():
+                    return
+
+                dest = os.path.join(self.stage_dir, task_name(task, i))
+                if os.path.exists(dest):
+                    shutil.rmtree(dest)
+                os.makedirs(dest, exist_ok=True)
+
+                t0 = time.time()
+                try:
+                    self.fetch(task, dest)
+                except BaseException:
+                    shutil.rmtree(dest, ignore_errors=True)
+                    raise
+                size = _dir_size(dest)
+                with self.cond:
+                    self.staged_bytes += size
+                    self.largest = max(self.largest, size)
+                if not self._put(("ok", task, dest, size, time.time() - t0)):
+                    # caller already left the loop
+                    self._release(dest, size)
+                    return
+        except BaseException as e:
+            self._put(("error", e, None, 0, 0))
+        finally:
+            self._put(("end", None, None, 0, 0))
+
+    def _put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.ready.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _release(self, dest, size):
+        shutil.rmtree(dest, ignore_errors=True)
+        with self.cond:
+            self.staged_bytes -= size
+            self.cond.notify_all()
+
+    def __iter__(self):
+        os.makedirs(self.stage_dir, exist_ok=True)
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+        try:
+            while True:
+                t0 = time.time()
+                kind, task, dest, size, fetch_secs = self.ready.get()
+                waited = time.time() - t0
+                if kind == "end":
+                    return
+                if kind == "error":
+                    raise task
+                self.stats.append({"task": task_name(task, len(self.stats)), "bytes": size,
+                                   "fetch_seconds": fetch_secs, "wait_seconds": waited})
+                try:
+                    yield task, dest
+                finally:
+                    # consumed (or the loop broke out) -> free the disk
+                    self._release(dest, size)
+        finally:
+            self.stop.set()
+            with self.cond:
+                self.cond.notify_all()
+            self.thread.join(timeout=5)
+            # anything staged ahead that we never got to
+            while True:
+                try:
+                    kind, _, dest, size, _ = self.ready.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "ok":
+                    self._release(dest, size)
+
+    def report(self):
+        fetch_total = sum(s["fetch_seconds"] for s in self.stats)
+        wait_total = sum(s["wait_seconds"] for s in self.stats)
+        for s in self.stats:
+            print(f"   {s['task']:<12} {s['bytes'] / 1024**3:7.2f} GB  fetch {s['fetch_seconds']:7.1f}s  "
+                  f"extractor waited {s['wait_seconds']:7.1f}s")
+        print(f"   fetch time total {fetch_total:.1f}s, of which the extractor sat waiting {wait_total:.1f}s")
+
+
+if __name__ == "__main__":
+    # python archive_prefetch.py <source_dir> <stage_dir> <budget_gb>
+    # dry run: stages every archive in source_dir one after another, no extraction
+    if len(sys.argv) < 4:
+        print("usage: python archive_prefetch.py <source_dir> <stage_dir> <budget_gb>")
+        sys.exit(1)
+    src, stage, budget = sys.argv[1], sys.argv[2], float(sys.argv[3])
+    names = sorted(f for f in os.listdir(src) if f.endswith(".zst"))
+    fetch, hint = local_fetcher(src)
+    sched = PrefetchScheduler([{"name": n, "files": [n]} for n in names], fetch, stage,
+                              int(budget * 1024**3), size_hint=hint)
+    for task, staged in sched:
+        print(f"staged {task['name']} -> {staged}")
+    sched.report()
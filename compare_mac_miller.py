@@ -1,5 +1,6 @@
-import json
 import os
+from volume_histogram import load_histogram
+from time_index import find_raw
 
 RAW_DIR = r"D:\Lyrics-Fanbase-Correlator\Processed_Artist_Data"
 
@@ -21,30 +22,14 @@ TARGETS = [
 ]
 
 def check_album_volume():
+    # per-day counts get built once per file and cached, every window after that is a lookup
     for raw_file, start_utc, end_utc, album_name in TARGETS:
-        input_path = os.path.join(RAW_DIR, raw_file)
-        
-        if not os.path.exists(input_path):
+        # plain file or its .zst archive
+        input_path = find_raw(os.path.join(RAW_DIR, raw_file))
+        if input_path is None:
             continue
-            
-        found_count = 0
-        
-        with open(input_path, 'r', encoding='utf-8') as f_in:
-            for line in f_in:
-                try:
-                    data = json.loads(line)
-                    utc_val = data.get('created_utc')
-                    
-                    if utc_val:
-                        utc_int = int(utc_val)
-                        if start_utc <= utc_int <= end_utc:
-                            text = data.get('body') or data.get('selftext') or data.get('title') or ""
-                            if text not in ['[removed]', '[deleted]', '']:
-                                found_count += 1
-                except Exception:
-                    continue
-        
-        print(f"{album_name} ({raw_file}): Found {found_count} valid posts")
+        hist = load_histogram(input_path)
+        print(f"{album_name} ({raw_file}): Found {hist.count(start_utc, end_utc)} valid posts")
 
 if __name__ == "__main__":
     check_album_volume()
\ No newline at end of file
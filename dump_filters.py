@@ -0,0 +1,210 @@
+import re
+import json
+
+# Cheap byte-level checks we can run on a raw dump line BEFORE paying for
+# json.loads. On the monthly Pushshift dumps >99% of lines are the wrong
+# sub or the wrong dates, so we only want to fully decode the survivors.
+#
+# Every check here is conservative: if it can't find the field it lets
+# the line through and the normal json path makes the final call.
+
+# orjson is 3-5x faster than the stdlib on reddit records. Optional though,
+# the scripts still run on a bare install.
+try:
+    import orjson
+    _fast_loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _fast_loads = json.loads
+    JSON_BACKEND = "json"
+
+# (?<!\\) so a quoted "created_utc" inside somebody's comment body
+# (which shows up escaped as \"created_utc\") doesn't count
+_UTC_RE = re.compile(rb'(?<!\\)"created_utc":\s*"?(\d+)')
+
+
+def loads(line):
+    """
+    Decodes one dump line (bytes or str). Uses orjson when it's installed
+    and falls back to the stdlib for lines orjson rejects (usually broken
+    utf-8, which the old TextIOWrapper(errors='ignore') used to paper over).
+    """
+    try:
+        return _fast_loads(line)
+    except ValueError:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='ignore')
+        return json.loads(line)
+
+
+def peek_created_utc(line):
+    """Pulls created_utc straight out of the raw bytes. None if it's not there."""
+    if isinstance(line, str):
+        line = line.encode('utf-8', errors='ignore')
+    m = _UTC_RE.search(line)
+    if not m:
+        return None
+    return int(m.group(1))
+
+
+def all_created_utc(line):
+    """Every created_utc in the line (crossposts carry their parent's too)."""
+    if isinstance(line, str):
+        line = line.encode('utf-8', errors='ignore')
+    return [int(ts) for ts in _UTC_RE.findall(line)]
+
+
+def make_time_filter(start_ts, end_ts):
+    """
+    Returns keep(line) -> bool. Drops lines whose created_utc is provably
+    outside [start_ts, end_ts], keeps everything else.
+    """
+    def keep(line):
+        if isinstance(line, str):
+            line = line.encode('utf-8', errors='ignore')
+        # crossposts embed the parent submission (with its own created_utc),
+        # so keep the line if ANY of the timestamps in it lands in range
+        found = _UTC_RE.findall(line)
+        if not found:
+            return True
+        return any(start_ts <= int(ts) <= end_ts for ts in found)
+    return keep
+
+
+def make_windows_filter(index):
+    """
+    Same idea as make_time_filter but against a release_windows.WindowIndex.
+    Keeps a line if any of its timestamps falls inside any window.
+    """
+    def keep(line):
+        if isinstance(line, str):
+            line = line.encode('utf-8', errors='ignore')
+        found = _UTC_RE.findall(line)
+        if not found:
+            return True
+        return any(index.contains(int(ts)) for ts in found)
+    return keep
+
+
+def make_subreddit_filter(subs, ignore_case=False):
+    """
+    Returns keep(line) -> bool that is only True when the line carries a
+    "subreddit":"<one of subs>" token. Lines without any subreddit field
+    get dropped too, since every scanner skips those after parsing anyway.
+    """
+    names = b"|".join(re.escape(s.encode('utf-8')) for s in subs)
+    flags = re.IGNORECASE if ignore_case else 0
+    pattern = re.compile(rb'(?<!\\)"subreddit":\s*"(?:' + names + rb')"', flags)
+
+    def keep(line):
+        if isinstance(line, str):
+            line = line.encode('utf-8', errors='ignore')
+        return pattern.search(line) is not None
+    return keep
+
+
+# Fields that identify a user. None of our outputs need them, so the stages
+# that hand whole records on (window_query, thread_join, time_index) drop them
+# right after decoding, and raw/ archives are written without them - see
+# time_index.py --archive. anonymize.py still cleans files already on disk.
+AUTHOR_KEYS = ("author", "author_fullname", "username")
+
+
+# A target key in key position: after { or , (anything inside a string has
+# its quotes escaped, so it can't match), then its value. Only string and
+# scalar values are cut on the bytes; anything else goes through json.
+_AUTHOR_KEY_RE = re.compile(rb'([{,])\s*"(?:' + b"|".join(k.encode() for k in AUTHOR_KEYS) + rb')"\s*:\s*')
+_STRING_RE = re.compile(rb'"(?:[^"\\]|\\.)*"', re.S)
+_SCALAR_RE = re.compile(rb'null|true|false|-?\d[\d.eE+-]*')
+_COMMA_RE = re.compile(rb'\s*,')
+_END_RE = re.compile(rb'\s*[,}]')
+
+
+def scrub_authors(data):
+    """
+    Drops AUTHOR_KEYS from a decoded record (in place) and returns it.
+    Nested records too - crossposts carry their parent's author.
+    """
+    if isinstance(data, dict):
+        for key in AUTHOR_KEYS:
+            data.pop(key, None)
+        for v in data.values():
+            if isinstance(v, (dict, list)):
+                scrub_authors(v)
+    elif isinstance(data, list):
+        for v in data:
+            if isinstance(v, (dict, list)):
+                scrub_authors(v)
+    return data
+
+
+def has_author_key(data):
+    """True if a decoded record (or anything nested in it) still has one of AUTHOR_KEYS."""
+    if isinstance(data, dict):
+        return any(k in data for k in AUTHOR_KEYS) or any(has_author_key(v) for v in data.values())
+    if isinstance(data, list):
+        return any(has_author_key(v) for v in data)
+    return False
+
+
+def strip_author_keys(line):
+    """
+    Cuts every AUTHOR_KEYS key/value pair straight out of a raw JSON line,
+    leaving the rest of the bytes alone. Returns None when it can't do that
+    safely (value isn't a string/scalar, or the line doesn't look like one
+    object) - use anonymize_line_json() for those.
+
+    This only looks at the key span: it doesn't check the rest of the line
+    is valid JSON, and key names spelled with \\u escapes (\\u0061uthor)
+    aren't recognised. anonymize_line() decodes the result to cover both.
+    """
+    line = line.strip()
+    if not (line.startswith(b"{") and line.endswith(b"}")):
+        return None
+    m = _AUTHOR_KEY_RE.search(line)
+    while m:
+        v = m.end()
+        value = (_STRING_RE if line[v:v + 1] == b'"' else _SCALAR_RE).match(line, v)
+        # the value has to end right where the pair does, or we misread it
+        if not value or not _END_RE.match(line, value.end()):
+            return None
+        if m.group(1) == b",":
+            # ,"author":"x"  -> gone, the comma before it with it
+            line = line[:m.start()] + line[value.end():]
+        else:
+            # {"author":"x",  -> {   (and the comma after it, if any)
+            comma = _COMMA_RE.match(line, value.end())
+            line = line[:m.start() + 1] + line[comma.end() if comma else value.end():]
+        m = _AUTHOR_KEY_RE.search(line, m.start())
+    return line + b"\n"
+
+
+def anonymize_line_json(line):
+    """The slow, always-right version: decode, scrub_authors(), re-encode. None if it isn't JSON."""
+    try:
+        data = loads(line)
+    except ValueError:
+        return None
+    return (json.dumps(scrub_authors(data)) + "\n").encode('utf-8')
+
+
+def anonymize_line_fast(line):
+    """
+    strip_author_keys() checked by one decode of its output: the bytes if
+    they're valid JSON with no author key left anywhere, else None. A decode
+    is still far cheaper than the decode + re-encode of anonymize_line_json().
+    """
+    out = strip_author_keys(line)
+    if out is None:
+        return None
+    try:
+        data = loads(out)
+    except ValueError:
+        return None
+    return None if has_author_key(data) else out
+
+
+def anonymize_line(line):
+    """Raw dump line -> the same record without AUTHOR_KEYS (bytes), None if it isn't JSON."""
+    out = anonymize_line_fast(line)
+    return out if out is not None else anonymize_line_json(line)
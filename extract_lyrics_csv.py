@@ -4,6 +4,7 @@ import sys
 import time
 from dotenv import load_dotenv
 import lyricsgenius
+from table_io import RowSink
 
 # Load token
 load_dotenv()
@@ -38,16 +39,15 @@ artists_data = {
 }
 
 
-def ensure_output():
-    if not os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-            writer.writerow(["Artist", "Album", "Title", "Lyrics"])
-
-
 def extract_and_save():
-    ensure_output()
+    # one open sink for the whole run; it's committed after every album so a
+    # crash only loses the album in progress, and never leaves a torn file
+    with RowSink(OUTPUT_FILE, ["Artist", "Album", "Title", "Lyrics"], append=True,
+                 quoting=csv.QUOTE_ALL) as out:
+        _extract_all(out)
+
 
+def _extract_all(out):
     for artist_name, albums in artists_data.items():
         print(f"Working on artist: {artist_name}")
         for album_name in albums:
@@ -87,12 +87,11 @@ def extract_and_save():
                     # remove any leading 'Lyrics' header that Genius may include
                     clean_lyrics = lyrics.split('Lyrics', 1)[-1] if 'Lyrics' in lyrics else lyrics
 
-                    with open(OUTPUT_FILE, "a", newline="", encoding="utf-8") as f:
-                        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-                        writer.writerow([artist_name, album_name, title, clean_lyrics])
-
+                    out.writerow([artist_name, album_name, title, clean_lyrics])
                     print(f"      Saved: {title}")
 
+                out.commit()
+
             except Exception as e:
                 print(f"    Error fetching album '{album_name}' for '{artist_name}': {e}")
                 time.sleep(1)
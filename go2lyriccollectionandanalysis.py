@@ -5,7 +5,8 @@ import lyricsgenius
 import statistics
 import time
 from dotenv import load_dotenv
-from transformers import pipeline
+from onnx_backend import load_classifier
+from lyric_scoring import score_songs
 
 # 1. SETUP
 load_dotenv()
@@ -27,7 +28,7 @@ ALBUM_FILE = "album_level_roberta_vad_fixed.csv"
 
 # 4. LOAD MODEL
 print("⏳ Loading RoBERTa-GoEmotions model...")
-classifier = pipeline("text-classification", model="SamLowe/roberta-base-go_emotions", return_all_scores=True)
+classifier = load_classifier(model="SamLowe/roberta-base-go_emotions", return_all_scores=True)
 
 # 5. VAD MAP
 vad_map = {
@@ -44,61 +45,28 @@ vad_map = {
     'approval': [0.6, 0.3, 0.5], 'disgust': [-0.8, 0.6, 0.5]
 }
 
-def analyze_lyrics(text):
-    chunk_size = 512
-    chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-    
-    total_v, total_a, total_d = 0, 0, 0
-    emotion_scores = {} 
-    valid_chunks = 0
-    
-    for chunk in chunks:
-        if len(chunk.strip()) < 10: continue
-        
-        try:
-            results = classifier(chunk)[0]
-            
-            chunk_v, chunk_a, chunk_d = 0, 0, 0
-            
-            for res in results:
-                lbl = res['label']
-                prob = res['score']
-                
-                emotion_scores[lbl] = emotion_scores.get(lbl, 0) + prob
-                
-                if lbl in vad_map:
-                    v, a, d = vad_map[lbl]
-                    chunk_v += v * prob
-                    chunk_a += a * prob
-                    chunk_d += d * prob
-            
-            total_v += chunk_v
-            total_a += chunk_a
-            total_d += chunk_d
-            valid_chunks += 1
-            
-        except Exception:
-            continue
-            
-    if valid_chunks == 0:
-        return 0.0, 0.0, 0.0, "neutral"
-        
-    avg_v = total_v / valid_chunks
-    avg_a = total_a / valid_chunks
-    avg_d = total_d / valid_chunks
-    
+def no_neutral(song):
     # --- THE FIX: BAN 'NEUTRAL' ---
-    # We remove 'neutral' from the dictionary before picking the winner.
-    if 'neutral' in emotion_scores:
-        del emotion_scores['neutral']
+    # We remove 'neutral' from the scores before picking the winner.
+    emotion_scores = {k: v for k, v in song['emotions'].items() if k != 'neutral'}
     
     # If the song was 100% neutral (rare), fallback to neutral
     if not emotion_scores:
-        dominant_emotion = "neutral"
-    else:
-        dominant_emotion = max(emotion_scores, key=emotion_scores.get)
-    
-    return avg_v, avg_a, avg_d, dominant_emotion
+        return "neutral"
+    return max(emotion_scores, key=emotion_scores.get)
+
+def analyze_songs(texts):
+    # every window of every song goes through the model together
+    results = []
+    for song in score_songs(classifier, texts, vad_map, dominant_of=no_neutral):
+        if song is None:
+            results.append((0.0, 0.0, 0.0, "neutral"))
+        else:
+            results.append((song['v'], song['a'], song['d'], song['dominant']))
+    return results
+
+def analyze_lyrics(text):
+    return analyze_songs([text])[0]
 
 artists_data = {
     "Eminem": ["Recovery", "Music to be Murdered By", "The Death of Slim Shady"],
@@ -145,6 +113,7 @@ def main():
 
                     album_valence, album_arousal, album_dominance = [], [], []
 
+                    titles, lyrics = [], []
                     for item in tracks_to_process:
                         if isinstance(item, tuple): _, track = item
                         else: track = item
@@ -155,18 +124,21 @@ def main():
                         
                         if not song_lyrics: continue
                         clean_lyrics = song_lyrics.split('Lyrics', 1)[-1] if 'Lyrics' in song_lyrics else song_lyrics
-                        
-                        v, a, d, dom_emo = analyze_lyrics(clean_lyrics)
-                        
+                        titles.append(title)
+                        lyrics.append(clean_lyrics)
+
+                    # whole album in one batched pass
+                    song_rows = []
+                    for title, (v, a, d, dom_emo) in zip(titles, analyze_songs(lyrics)):
                         album_valence.append(v)
                         album_arousal.append(a)
                         album_dominance.append(d)
 
                         print(f"      > {title[:20]}... | V:{v:.2f} A:{a:.2f} D:{d:.2f} | {dom_emo}")
+                        song_rows.append([artist_name, album_name, title, v, a, d, dom_emo])
 
-                        with open(SONG_FILE, 'a', newline='', encoding='utf-8') as f:
-                            writer = csv.writer(f)
-                            writer.writerow([artist_name, album_name, title, v, a, d, dom_emo])
+                    with open(SONG_FILE, 'a', newline='', encoding='utf-8') as f:
+                        csv.writer(f).writerows(song_rows)
 
                     if len(album_valence) > 0:
                         avg_v = statistics.mean(album_valence)
@@ -1,11 +1,13 @@
 import os
-import csv
 import sys
 import lyricsgenius
 import statistics
 import time
 from dotenv import load_dotenv
 from transformers import pipeline
+from score_cache import cached
+from table_io import RowSink
+from lyric_scoring import score_songs
 
 # 1. SETUP
 load_dotenv()
@@ -27,7 +29,7 @@ ALBUM_FILE = "album_level_jhartmann_vad.csv"
 
 # 4. LOAD MODEL
 print("⏳ Loading j-hartmann/emotion-english-distilroberta-base...")
-classifier = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", return_all_scores=True)
+classifier = cached(pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", return_all_scores=True))
 
 # 5. VAD MAP (Ekman's 7 Emotions)
 vad_map = {
@@ -40,63 +42,29 @@ vad_map = {
     'surprise':[ 0.5,  0.9,  0.1]  
 }
 
-def analyze_lyrics(text):
-    chunk_size = 512
-    chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-    
-    total_v, total_a, total_d = 0, 0, 0
-    emotion_scores = {} 
-    valid_chunks = 0
-    
-    for chunk in chunks:
-        if len(chunk.strip()) < 10: continue
-        
-        try:
-            results = classifier(chunk)[0]
-            
-            chunk_v, chunk_a, chunk_d = 0, 0, 0
-            
-            for res in results:
-                lbl = res['label']
-                prob = res['score']
-                
-                emotion_scores[lbl] = emotion_scores.get(lbl, 0) + prob
-                
-                if lbl in vad_map:
-                    v, a, d = vad_map[lbl]
-                    chunk_v += v * prob
-                    chunk_a += a * prob
-                    chunk_d += d * prob
-            
-            total_v += chunk_v
-            total_a += chunk_a
-            total_d += chunk_d
-            valid_chunks += 1
-            
-        except Exception:
-            continue
-            
-    if valid_chunks == 0:
-        return 0.0, 0.0, 0.0, "neutral"
-        
-    avg_v = total_v / valid_chunks
-    avg_a = total_a / valid_chunks
-    avg_d = total_d / valid_chunks
-    
+def soft_neutral(song):
     # Soft Neutral Filter
-    sorted_emotions = sorted(emotion_scores.items(), key=lambda x: x[1], reverse=True)
+    sorted_emotions = sorted(song['emotions'].items(), key=lambda x: x[1], reverse=True)
     winner, winner_score = sorted_emotions[0]
     
     if winner == 'neutral' and len(sorted_emotions) > 1:
         runner_up, runner_score = sorted_emotions[1]
         if runner_score > (winner_score * 0.6):
-            dominant_emotion = runner_up
+            return runner_up
+    return winner
+
+def analyze_songs(texts):
+    # every window of every song goes through the model together
+    results = []
+    for song in score_songs(classifier, texts, vad_map, dominant_of=soft_neutral):
+        if song is None:
+            results.append((0.0, 0.0, 0.0, "neutral"))
         else:
-            dominant_emotion = winner
-    else:
-        dominant_emotion = winner
-    
-    return avg_v, avg_a, avg_d, dominant_emotion
+            results.append((song['v'], song['a'], song['d'], song['dominant']))
+    return results
+
+def analyze_lyrics(text):
+    return analyze_songs([text])[0]
 
 artists_data = {
     "Eminem": ["Recovery", "Music to be Murdered By", "The Death of Slim Shady"],
@@ -116,18 +84,14 @@ artists_data = {
 }
 
 def main():
-    # Song CSV
-    if not os.path.exists(SONG_FILE):
-        with open(SONG_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Artist', 'Album', 'Title', 'Valence', 'Arousal', 'Dominance', 'Primary_Emotion'])
-
-    # Album CSV (Updated Header)
-    if not os.path.exists(ALBUM_FILE):
-        with open(ALBUM_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Artist', 'Album', 'Avg_Valence', 'Avg_Arousal', 'Avg_Dominance', 'Album_Primary_Emotion', 'Song_Count'])
-
+    # Both CSVs stay open for the whole run (appending to what's there) and get
+    # committed after each album, instead of reopening them for every song
+    song_out = RowSink(SONG_FILE, ['Artist', 'Album', 'Title', 'Valence', 'Arousal', 'Dominance', 'Primary_Emotion'], append=True)
+    album_out = RowSink(ALBUM_FILE, ['Artist', 'Album', 'Avg_Valence', 'Avg_Arousal', 'Avg_Dominance', 'Album_Primary_Emotion', 'Song_Count'], append=True)
+    with song_out, album_out:
+        analyze_all(song_out, album_out)
+
+def analyze_all(song_out, album_out):
     for artist_name, albums in artists_data.items():
         print(f"Working on artist: {artist_name}")
         
@@ -148,6 +112,7 @@ def main():
                     album_dominance = []
                     album_emotions_list = [] # Track every song's emotion
 
+                    titles, lyrics = [], []
                     for item in tracks_to_process:
                         if isinstance(item, tuple): _, track = item
                         else: track = item
@@ -158,9 +123,11 @@ def main():
                         
                         if not song_lyrics: continue
                         clean_lyrics = song_lyrics.split('Lyrics', 1)[-1] if 'Lyrics' in song_lyrics else song_lyrics
-                        
-                        v, a, d, dom_emo = analyze_lyrics(clean_lyrics)
-                        
+                        titles.append(title)
+                        lyrics.append(clean_lyrics)
+
+                    # whole album in one batched pass
+                    for title, (v, a, d, dom_emo) in zip(titles, analyze_songs(lyrics)):
                         album_valence.append(v)
                         album_arousal.append(a)
                         album_dominance.append(d)
@@ -168,9 +135,7 @@ def main():
 
                         print(f"      > {title[:20]}... | V:{v:.2f} A:{a:.2f} | A:{d:.2f} | {dom_emo}")
 
-                        with open(SONG_FILE, 'a', newline='', encoding='utf-8') as f:
-                            writer = csv.writer(f)
-                            writer.writerow([artist_name, album_name, title, v, a, d, dom_emo])
+                        song_out.writerow([artist_name, album_name, title, v, a, d, dom_emo])
 
                     if len(album_valence) > 0:
                         # Math Averages
@@ -186,10 +151,10 @@ def main():
                             # Fallback if there are multiple modes (e.g. 5 Sad, 5 Joy)
                             overall_emotion = max(set(album_emotions_list), key=album_emotions_list.count)
 
-                        with open(ALBUM_FILE, 'a', newline='', encoding='utf-8') as f:
-                            writer = csv.writer(f)
-                            writer.writerow([artist_name, album_name, avg_v, avg_a, avg_d, overall_emotion, len(album_valence)])
-                            
+                        album_out.writerow([artist_name, album_name, avg_v, avg_a, avg_d, overall_emotion, len(album_valence)])
+                        song_out.commit()
+                        album_out.commit()
+
                         print(f"Album Saved. Primary Emotion: {overall_emotion.upper()}")
                 else:
                     print(f"      Could not find album: {album_name}")
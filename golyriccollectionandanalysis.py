@@ -6,6 +6,8 @@ import statistics
 import time
 from dotenv import load_dotenv
 from transformers import pipeline
+from score_cache import cached
+from lyric_scoring import score_songs
 
 # Load my environment variables
 load_dotenv()
@@ -28,7 +30,7 @@ ALBUM_FILE = "album_level_goemotions.csv"
 
 print("Loading GoEmotions BERT model...")
 # Using the 28-emotion model instead of the basic 6-emotion one
-classifier = pipeline("text-classification", model="monologg/bert-base-cased-goemotions-original", return_all_scores=True)
+classifier = cached(pipeline("text-classification", model="monologg/bert-base-cased-goemotions-original", return_all_scores=True))
 
 # --- 28-DIMENSION EMOTION MAP ---
 # Mapping these specific 28 emotions to the VAD (Valence, Arousal, Dominance) scale
@@ -72,56 +74,19 @@ vad_map = {
     'approval':       [ 0.6,  0.3,  0.5],
 }
 
+def analyze_songs(texts):
+    # every window of every song goes through the model together;
+    # the dominant emotion is whichever of the 28 had the highest cumulative score
+    results = []
+    for song in score_songs(classifier, texts, vad_map):
+        if song is None:
+            results.append((0.0, 0.0, 0.0, "neutral"))
+        else:
+            results.append((song['v'], song['a'], song['d'], song['dominant']))
+    return results
+
 def analyze_lyrics(text):
-    chunk_size = 512
-    chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-    
-    total_v, total_a, total_d = 0, 0, 0
-    emotion_scores = {} 
-    valid_chunks = 0
-    
-    for chunk in chunks:
-        if len(chunk.strip()) < 10: continue
-        
-        try:
-            results = classifier(chunk)[0]
-            
-            chunk_v, chunk_a, chunk_d = 0, 0, 0
-            
-            # Iterate through all 28 emotions for this chunk
-            for res in results:
-                lbl = res['label']
-                prob = res['score']
-                
-                # Accumulate the score for determining the dominant emotion later
-                emotion_scores[lbl] = emotion_scores.get(lbl, 0) + prob
-                
-                # Weighted VAD calculation
-                if lbl in vad_map:
-                    v, a, d = vad_map[lbl]
-                    chunk_v += v * prob
-                    chunk_a += a * prob
-                    chunk_d += d * prob
-            
-            total_v += chunk_v
-            total_a += chunk_a
-            total_d += chunk_d
-            valid_chunks += 1
-            
-        except Exception:
-            continue
-            
-    if valid_chunks == 0:
-        return 0.0, 0.0, 0.0, "neutral"
-        
-    avg_v = total_v / valid_chunks
-    avg_a = total_a / valid_chunks
-    avg_d = total_d / valid_chunks
-    
-    # Determine which of the 28 emotions had the highest cumulative score
-    dominant_emotion = max(emotion_scores, key=emotion_scores.get) if emotion_scores else "neutral"
-    
-    return avg_v, avg_a, avg_d, dominant_emotion
+    return analyze_songs([text])[0]
 
 artists_data = {
     "Eminem": ["Recovery", "Music to be Murdered By", "The Death of Slim Shady"],
@@ -170,6 +135,7 @@ def main():
 
                     album_valence, album_arousal, album_dominance = [], [], []
 
+                    titles, lyrics = [], []
                     for item in tracks_to_process:
                         if isinstance(item, tuple): _, track = item
                         else: track = item
@@ -180,19 +146,21 @@ def main():
                         
                         if not song_lyrics: continue
                         clean_lyrics = song_lyrics.split('Lyrics', 1)[-1] if 'Lyrics' in song_lyrics else song_lyrics
-                        
-                        # Run the complex analysis
-                        v, a, d, dom_emo = analyze_lyrics(clean_lyrics)
-                        
+                        titles.append(title)
+                        lyrics.append(clean_lyrics)
+
+                    # Run the complex analysis, whole album in one batched pass
+                    song_rows = []
+                    for title, (v, a, d, dom_emo) in zip(titles, analyze_songs(lyrics)):
                         album_valence.append(v)
                         album_arousal.append(a)
                         album_dominance.append(d)
 
                         print(f"      > {title} | V:{v:.2f} A:{a:.2f} D:{d:.2f} | {dom_emo}")
+                        song_rows.append([artist_name, album_name, title, v, a, d, dom_emo])
 
-                        with open(SONG_FILE, 'a', newline='', encoding='utf-8') as f:
-                            writer = csv.writer(f)
-                            writer.writerow([artist_name, album_name, title, v, a, d, dom_emo])
+                    with open(SONG_FILE, 'a', newline='', encoding='utf-8') as f:
+                        csv.writer(f).writerows(song_rows)
 
                     if len(album_valence) > 0:
                         avg_v = statistics.mean(album_valence)
@@ -0,0 +1,236 @@
+import os
+import math
+import sqlite3
+import hashlib
+import pandas as pd
+
+# Remembers which posts a writer has already handled, across sources and runs.
+#
+# processredditdata merges the raw dumps with the 2025 CSV exports (which
+# overlap), and add_missing_data / process_legacy_data / reddit_process all
+# APPEND to _FullDist.csv - so every rerun used to score the same comments
+# again and count them twice in the event study.
+#
+# IdSet is one named scope (e.g. "scored:Drake_FullDist.csv") in a SQLite
+# file next to the outputs. The SQLite table is the exact set; a Bloom
+# filter in front of it answers "definitely new" from memory, so only the
+# (rare) repeats and false positives ever touch the disk. Memory is the
+# filter's bit array - fixed by capacity, not by how many ids are stored.
+#
+# Keys are the reddit id when there is one, otherwise a hash of the text
+# (whitespace-normalised), which is what reddit_process deduped on before.
+# The _FullDist files don't carry ids, so the "scored:" scopes always key on text.
+
+SEEN_DB = "seen_ids.sqlite"
+BLOOM_CAPACITY = 2_000_000       # ids per scope before the false-positive rate starts creeping up
+BLOOM_FP_RATE = 0.01
+INSERT_BATCH = 10_000
+SEED_CHUNK_ROWS = 100_000
+
+ID_COLUMNS = ['id', 'ID', 'post_id']
+TEXT_COLUMNS = ['Text', 'text', 'body', 'selftext', 'Comment']
+NO_ID = {"", "csv_import", "nan", "None"}
+
+
+def row_key(row_id, text=None):
+    if row_id is not None and str(row_id) not in NO_ID:
+        return str(row_id)
+    norm = " ".join(str(text or "").split())
+    return "text:" + hashlib.blake2b(norm.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def frame_keys(df, use_ids=True):
+    """row_key() for every row of df, from whichever id/text columns it has."""
+    id_col = next((c for c in ID_COLUMNS if c in df.columns), None) if use_ids else None
+    text_col = next((c for c in TEXT_COLUMNS if c in df.columns), None)
+    ids = df[id_col].tolist() if id_col else [None] * len(df)
+    texts = df[text_col].tolist() if text_col else [None] * len(df)
+    return [row_key(i if not (isinstance(i, float) and math.isnan(i)) else None, t)
+            for i, t in zip(ids, texts)]
+
+
+class BloomFilter:
+    def __init__(self, capacity=BLOOM_CAPACITY, fp_rate=BLOOM_FP_RATE):
+        self.m = max(64, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+
+    def _positions(self, key):
+        # double hashing: k positions out of one 128-bit digest
+        d = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(d[:8], 'little')
+        h2 = int.from_bytes(d[8:], 'little') | 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+class IdSet:
+    """
+    ids = IdSet(os.path.join(OUTPUT_DIR, SEEN_DB), "scored:Drake_FullDist.csv")
+    if ids.add(key): ...   # True the first time a key is seen
+    ids.commit()           # after the rows themselves are safely written
+
+    Adds only become permanent on commit(); close() without it forgets them.
+    With tracks=<output file>, each commit also records that file's size and
+    mtime, and in_sync() says whether the file is still the one the ids
+    describe (it isn't if it was deleted, replaced, or written without a commit).
+    """
+
+    def __init__(self, db_path, scope, capacity=BLOOM_CAPACITY, fp_rate=BLOOM_FP_RATE, tracks=None):
+        self.db_path = db_path
+        self.scope = scope
+        self.tracks = tracks
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        d = os.path.dirname(os.path.abspath(db_path))
+        if not os.path.exists(d):
+            os.makedirs(d)
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS ids (scope TEXT, id TEXT, PRIMARY KEY (scope, id)) WITHOUT ROWID")
+        self._db.execute("CREATE TABLE IF NOT EXISTS scopes (scope TEXT PRIMARY KEY, fingerprint TEXT)")
+        self._db.commit()
+        self._pending = []
+        self.disk_checks = 0
+        self._load()
+
+    def _load(self):
+        self.bloom = BloomFilter(self.capacity, self.fp_rate)
+        self.count = 0
+        for (key,) in self._db.execute("SELECT id FROM ids WHERE scope = ?", (self.scope,)):
+            self.bloom.add(key)
+            self.count += 1
+        if self.count > self.capacity:
+            print(f"   [ids] {self.scope} holds {self.count} ids, over the Bloom capacity "
+                  f"({self.capacity}) - still exact, just more disk lookups")
+
+    def __contains__(self, key):
+        if key not in self.bloom:
+            return False
+        self._flush()
+        self.disk_checks += 1
+        return self._db.execute("SELECT 1 FROM ids WHERE scope = ? AND id = ?",
+                                (self.scope, key)).fetchone() is not None
+
+    def __len__(self):
+        return self.count
+
+    def add(self, key):
+        """Adds key, returns False if it was already there."""
+        if key in self:
+            return False
+        self.bloom.add(key)
+        self._pending.append((self.scope, key))
+        self.count += 1
+        if len(self._pending) >= INSERT_BATCH:
+            self._flush()
+        return True
+
+    def add_all(self, keys):
+        return sum(self.add(k) for k in keys)
+
+    def _flush(self):
+        # inside the open transaction: visible to our own lookups, not yet durable
+        if self._pending:
+            self._db.executemany("INSERT OR IGNORE INTO ids VALUES (?, ?)", self._pending)
+            self._pending = []
+
+    def _fingerprint(self):
+        # "" when the tracked file doesn't exist (yet)
+        try:
+            st = os.stat(self.tracks)
+        except OSError:
+            return ""
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def in_sync(self):
+        """True if the tracked file is exactly as it was at the last commit."""
+        row = self._db.execute("SELECT fingerprint FROM scopes WHERE scope = ?", (self.scope,)).fetchone()
+        return row is not None and row[0] == self._fingerprint()
+
+    def commit(self):
+        self._flush()
+        if self.tracks is not None:
+            # same transaction as the ids, so the two can't disagree after a crash
+            self._db.execute("INSERT OR REPLACE INTO scopes VALUES (?, ?)", (self.scope, self._fingerprint()))
+        self._db.commit()
+
+    def reset(self):
+        """Forgets the whole scope (for outputs that get rewritten from scratch)."""
+        self._pending = []
+        self._db.execute("DELETE FROM ids WHERE scope = ?", (self.scope,))
+        self._db.execute("DELETE FROM scopes WHERE scope = ?", (self.scope,))
+        self._db.commit()
+        self._load()
+
+    def close(self):
+        self._pending = []
+        self._db.rollback()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def scored_ids(out_dir, out_name):
+    """
+    The id set for an appended-to output like Drake_FullDist.csv. It tracks
+    the file: whenever the file isn't the one the set last committed against
+    (first use, deleted, moved, regenerated, appended to after a crash) the
+    set is thrown away and re-read from whatever the file holds now, so the
+    file stays the source of truth for what's been scored.
+    """
+    path = os.path.join(out_dir, out_name)
+    ids = IdSet(os.path.join(out_dir, SEEN_DB), f"scored:{out_name}", tracks=path)
+    if ids.in_sync():
+        return ids
+    if len(ids):
+        print(f"   [ids] {out_name} changed since the last run, re-reading it")
+    ids.reset()
+    if os.path.exists(path):
+        for chunk in pd.read_csv(path, chunksize=SEED_CHUNK_ROWS, low_memory=False, on_bad_lines='skip'):
+            ids.add_all(frame_keys(chunk, use_ids=False))
+        print(f"   [ids] seeded {len(ids)} already-scored ids from {out_name}")
+    ids.commit()
+    return ids
+
+
+def drop_seen(df, ids):
+    """
+    df minus rows already in a scored_ids() set (and repeats within df), by
+    text. Adds a '_key' column to commit once the rows are written.
+    """
+    df = df.copy()
+    df['_key'] = frame_keys(df, use_ids=False)
+    df = df.drop_duplicates(subset=['_key'])
+    return df[[k not in ids for k in df['_key']]]
+
+
+class DedupeWriter:
+    """Wraps a csv-style writer; rows whose key_of(row) was already seen are dropped."""
+
+    def __init__(self, writer, ids, key_of):
+        self.writer = writer
+        self.ids = ids
+        self.key_of = key_of
+        self.dropped = 0
+
+    def writerow(self, row):
+        if self.ids.add(self.key_of(row)):
+            self.writer.writerow(row)
+        else:
+            self.dropped += 1
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
@@ -5,12 +5,12 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.stats import pearsonr, ttest_ind
 import torch
-from transformers import pipeline
-from tqdm import tqdm
 import lyricsgenius
 from dotenv import load_dotenv
 import warnings
 import re
+from onnx_backend import load_classifier
+from token_windows import score_windows
 
 warnings.filterwarnings('ignore')
 
@@ -74,8 +74,9 @@ def load_ai():
         print("\n[SYSTEM] Loading GoEmotions AI Model...")
         device = 0 if torch.cuda.is_available() else -1
         # strict token limit enforced here
-        classifier = pipeline(
-            "text-classification", 
+        # cached: lyrics and reddit text scored on an earlier run aren't scored again
+        # EMOTION_BACKEND=onnx / onnx-int8 runs it on ONNX Runtime (onnx_backend.py)
+        classifier = load_classifier(
             model="SamLowe/roberta-base-go_emotions", 
             top_k=None, 
             device=device,
@@ -140,8 +141,9 @@ def run_everything():
             if track_lyrics:
                 clf = load_ai()
                 print(f"   [AI] Scoring {len(track_lyrics)} tracks for {album}...")
-                for lyr in tqdm(track_lyrics, desc=f"Scoring {album}"):
-                    res = clf(str(lyr)[:2000], truncation=True)[0]
+                # whole songs, windowed over tokens instead of cut at 2000 chars
+                results, _ = score_windows(clf, [str(lyr) for lyr in track_lyrics])
+                for res in results:
                     row_dict = {pred['label']: pred['score'] for pred in res}
                     row_dict.update({'Artist': artist_name, 'Album': album})
                     new_rows.append(row_dict)
@@ -189,11 +191,9 @@ def run_everything():
                     df = df[df[t_col].str.len() > 0]
                     
                     txts = df[t_col].astype(str).tolist()
-                    scores = []
-                    for i in tqdm(range(0, len(txts), 128), desc="Inference"):
-                        # force truncation
-                        res = clf([str(t)[:2000] for t in txts[i:i+128]], truncation=True)
-                        scores.extend([{p['label']: p['score'] for p in r} for r in res])
+                    # long posts are scored over token windows instead of being cut at 2000 chars
+                    res, _ = score_windows(clf, txts)
+                    scores = [{p['label']: p['score'] for p in r} for r in res]
                     
                     df = pd.concat([df.reset_index(drop=True), pd.DataFrame(scores).reset_index(drop=True)], axis=1)
                     df.to_csv(f, index=False)
@@ -237,6 +237,8 @@ def run_everything():
             master_stats.append(summary)
 
     pd.DataFrame(master_stats).to_csv(os.path.join(OUTPUT_DIR, "Final_Results.csv"), index=False)
+    if classifier is not None:
+        classifier.report()
     print("\n--- ALL FINISHED. GRAPHS GENERATED. ---")
 
 if __name__ == "__main__":
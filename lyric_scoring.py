@@ -0,0 +1,89 @@
+import statistics
+import numpy as np
+from token_windows import score_windows
+
+# Batched lyric scoring.
+#
+# The lyric scripts used to call classifier(chunk) once per 512-char chunk,
+# one song at a time, so a 15-track album was ~60 separate pipeline calls
+# and the per-call overhead cost more than the model. score_songs() cuts
+# every song of an album (or of a whole lyrics CSV) into token windows
+# (token_windows.py), sends all of them through the classifier in one
+# length-bucketed pass, and reduces the window scores back to one result
+# per song:
+#   v, a, d   = mean over the song's windows of the probability-weighted VAD
+#   emotions  = label -> score summed over the song's windows
+#   dominant  = dominant_of(song), by default the label with the biggest sum
+#
+#   songs = score_songs(classifier, lyrics, vad_map)
+#   avg_v, avg_a, avg_d, primary, n = summarize_album(songs)
+
+MIN_TOKENS = 3         # shorter lyrics (a stray "yeah") aren't worth a score
+
+
+def top_emotion(song):
+    """Label with the largest summed score."""
+    emotions = song['emotions']
+    return max(emotions, key=emotions.get) if emotions else "neutral"
+
+
+def _score(classifier, texts, **kwargs):
+    # one pass for everything; if the batch blows up, fall back to song by
+    # song so one bad song only loses itself
+    try:
+        return score_windows(classifier, texts, min_tokens=MIN_TOKENS, **kwargs)
+    except Exception as e:
+        print(f"      Batched scoring failed ({e}), retrying song by song...")
+    results, counts = [None] * len(texts), np.zeros(len(texts), dtype=int)
+    for i, text in enumerate(texts):
+        try:
+            res, n = score_windows(classifier, [text], min_tokens=MIN_TOKENS, **kwargs)
+            results[i], counts[i] = res[0], n[0]
+        except Exception:
+            continue
+    return results, counts
+
+
+def score_songs(classifier, texts, vad_map, dominant_of=top_emotion, **kwargs):
+    """
+    One dict per text ({'v', 'a', 'd', 'emotions', 'dominant', 'chunks'}),
+    or None for a text with nothing to score. Labels missing from vad_map
+    still count towards the emotion sums but add nothing to VAD.
+    """
+    texts = [str(t) for t in texts]
+    results, counts = _score(classifier, texts, **kwargs)
+    songs = []
+    for res, n in zip(results, counts):
+        n = int(n)
+        if res is None or not n:
+            songs.append(None)
+            continue
+        # VAD is linear in the probabilities, so the mean of the window VADs
+        # is the VAD of the mean window scores
+        v = a = d = 0.0
+        for r in res:
+            cv, ca, cd = vad_map.get(r['label'], (0.0, 0.0, 0.0))
+            v += cv * r['score']; a += ca * r['score']; d += cd * r['score']
+        song = {'v': v, 'a': a, 'd': d, 'emotions': {r['label']: r['score'] * n for r in res}, 'chunks': n}
+        song['dominant'] = dominant_of(song)
+        songs.append(song)
+    return songs
+
+
+def summarize_album(songs, tie_break=None):
+    """
+    (avg_v, avg_a, avg_d, primary emotion, song count) over the scored songs;
+    primary is the most common song dominant. None if nothing was scored.
+    """
+    songs = [s for s in songs if s is not None]
+    if not songs:
+        return None
+    avg_v = statistics.mean(s['v'] for s in songs)
+    avg_a = statistics.mean(s['a'] for s in songs)
+    avg_d = statistics.mean(s['d'] for s in songs)
+    emotions = [s['dominant'] for s in songs]
+    try:
+        primary = statistics.mode(emotions)
+    except statistics.StatisticsError:
+        primary = tie_break(avg_v, avg_a, avg_d) if tie_break else max(set(emotions), key=emotions.count)
+    return avg_v, avg_a, avg_d, primary, len(songs)
@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import platform
+import numpy as np
+from transformers import pipeline, AutoConfig, AutoTokenizer
+from score_cache import cached
+from token_batches import score_bucketed
+
+try:
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+except ImportError:
+    ort = None
+
+# ONNX Runtime backend for the emotion classifier on CPU-only nodes.
+#
+# The GoEmotions roberta through the torch pipeline is the biggest compute
+# cost of a run. With EMOTION_BACKEND=onnx the model is exported to ONNX once
+# (under ONNX_DIR) and run by ONNX Runtime; with onnx-int8 the export is also
+# dynamically quantized to int8 (weights int8, activations quantized on the
+# fly, no calibration data needed). Either way the result is still a
+# transformers pipeline, so the score cache, the length bucketing and the
+# token windows work exactly as before. The cache keys on the backend and
+# the exported file, so int8 scores never get mixed up with torch ones.
+#
+# Before switching a run over, check the scores still agree:
+#   python onnx_backend.py <FullDist or filtered csv> [sample size] [backend]
+# prints (and saves to PARITY_FILE) the max abs diff per label, top label
+# agreement, VAD drift and texts/sec against torch.
+#
+#   classifier = load_classifier(top_k=None)    # GoEmotions on EMOTION_BACKEND
+
+GOEMOTIONS_MODEL = "SamLowe/roberta-base-go_emotions"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+BACKEND = os.environ.get("EMOTION_BACKEND", "torch")
+ONNX_DIR = os.environ.get("ONNX_DIR", "onnx_models")
+ONNX_FILE = "model.onnx"
+INT8_FILE = "model_quantized.onnx"     # what ORTQuantizer names it
+PARITY_SAMPLE = 500
+PARITY_READ_ROWS = 50_000              # rows read from the csv to draw the sample from
+PARITY_FILE = "onnx_parity.json"
+
+
+def _model_dir(model, backend):
+    return os.path.join(ONNX_DIR, model.replace("/", "__"), "int8" if backend == "onnx-int8" else "fp32")
+
+
+def _quantization_config():
+    # pick the int8 kernels this CPU actually has
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    flags = ""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        pass
+    if "avx512_vnni" in flags:
+        return AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    if "avx512f" in flags:
+        return AutoQuantizationConfig.avx512(is_static=False, per_channel=False)
+    return AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+
+
+def export_onnx(model=GOEMOTIONS_MODEL, quantize=False):
+    """
+    Export model to ONNX (and int8 if quantize) unless it's already on disk.
+    Returns (directory, file name) of the model to load.
+    """
+    if ort is None:
+        raise ImportError("the onnx backend needs optimum and onnxruntime (pip install optimum[onnxruntime])")
+    fp32_dir = _model_dir(model, "onnx")
+    if not os.path.exists(os.path.join(fp32_dir, ONNX_FILE)):
+        print(f"Exporting {model} to ONNX (one time)...")
+        ORTModelForSequenceClassification.from_pretrained(model, export=True).save_pretrained(fp32_dir)
+        AutoTokenizer.from_pretrained(model).save_pretrained(fp32_dir)
+    if not quantize:
+        return fp32_dir, ONNX_FILE
+
+    int8_dir = _model_dir(model, "onnx-int8")
+    if not os.path.exists(os.path.join(int8_dir, INT8_FILE)):
+        print(f"Quantizing {model} to int8 (dynamic, one time)...")
+        quantizer = ORTQuantizer.from_pretrained(fp32_dir, file_name=ONNX_FILE)
+        quantizer.quantize(save_dir=int8_dir, quantization_config=_quantization_config())
+        AutoConfig.from_pretrained(fp32_dir).save_pretrained(int8_dir)
+        AutoTokenizer.from_pretrained(fp32_dir).save_pretrained(int8_dir)
+    return int8_dir, INT8_FILE
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def build_pipeline(model=GOEMOTIONS_MODEL, backend=BACKEND, device=-1, **pipe_kwargs):
+    """Uncached text-classification pipeline on backend. Returns (pipeline, backend actually used)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend != "torch" and ort is None:
+        print("   [onnx] optimum / onnxruntime not installed (pip install optimum[onnxruntime]), using torch")
+        backend = "torch"
+    if backend != "torch" and device is not None and device >= 0:
+        # ORT here is the CPU build; on a GPU box torch is the faster path anyway
+        print("   [onnx] GPU available, using torch")
+        backend = "torch"
+    if backend == "torch":
+        return pipeline("text-classification", model=model, device=device, **pipe_kwargs), backend
+
+    model_dir, file_name = export_onnx(model, quantize=(backend == "onnx-int8"))
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = os.cpu_count() or 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    ort_model = ORTModelForSequenceClassification.from_pretrained(
+        model_dir, file_name=file_name, provider="CPUExecutionProvider", session_options=options)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return pipeline("text-classification", model=ort_model, tokenizer=tokenizer, **pipe_kwargs), backend
+
+
+def load_classifier(model=GOEMOTIONS_MODEL, backend=BACKEND, device=-1, **pipe_kwargs):
+    """build_pipeline() behind the score cache, keyed on the backend that's really running."""
+    clf, backend = build_pipeline(model, backend, device, **pipe_kwargs)
+    if backend == "torch":
+        return cached(clf)
+    print(f"   [onnx] {model} on ONNX Runtime ({backend})")
+    model_dir, file_name = export_onnx(model, quantize=(backend == "onnx-int8"))
+    return cached(clf, model_id=f"{model}@{backend}", revision=_file_digest(os.path.join(model_dir, file_name)))
+
+
+# --- parity / throughput check ---
+
+def _score_matrix(clf, texts, labels=None):
+    start = time.perf_counter()
+    out = score_bucketed(clf, texts, truncation=True, max_length=512)
+    elapsed = time.perf_counter() - start
+    out = [r if isinstance(r, list) else [r] for r in out]
+    labels = labels or sorted(r['label'] for r in out[0])
+    probs = np.array([[{r['label']: r['score'] for r in res}.get(lbl, 0.0) for lbl in labels] for res in out])
+    return labels, probs, elapsed
+
+
+def _vad(probs, labels, vad_map):
+    # same weighting as calculate_vad_for_df: probability-weighted mean of the label coordinates
+    coords = np.array([vad_map.get(lbl, [0.0, 0.0, 0.0]) for lbl in labels])
+    psum = probs.sum(axis=1, keepdims=True)
+    psum[psum == 0] = 1
+    return probs @ coords / psum
+
+
+def parity_report(texts, model=GOEMOTIONS_MODEL, backend="onnx-int8", vad_map=None, out_file=PARITY_FILE):
+    """
+    Score texts with torch and with backend (uncached, same batching) and
+    compare: per-label max / mean abs diff, top label agreement, VAD drift
+    and texts/sec. Prints a summary and writes it to out_file as JSON.
+    """
+    texts = [str(t) for t in texts]
+    ref, _ = build_pipeline(model, "torch", -1, top_k=None)
+    cand, used = build_pipeline(model, backend, -1, top_k=None)
+    if used == "torch":
+        print("Nothing to compare: the onnx backend isn't available here.")
+        return None
+
+    # one small warm-up batch each so session / thread pool start-up isn't timed
+    _score_matrix(ref, texts[:8])
+    _score_matrix(cand, texts[:8])
+    labels, p_ref, t_ref = _score_matrix(ref, texts)
+    _, p_cand, t_cand = _score_matrix(cand, texts, labels)
+
+    diff = np.abs(p_ref - p_cand)
+    report = {
+        'model': model,
+        'backend': backend,
+        'texts': len(texts),
+        'max_abs_diff': float(diff.max()),
+        'per_label_max_abs_diff': {lbl: float(d) for lbl, d in zip(labels, diff.max(axis=0))},
+        'per_label_mean_abs_diff': {lbl: float(d) for lbl, d in zip(labels, diff.mean(axis=0))},
+        'top_label_agreement': float((p_ref.argmax(axis=1) == p_cand.argmax(axis=1)).mean()),
+        'torch_texts_per_sec': len(texts) / t_ref,
+        f'{backend}_texts_per_sec': len(texts) / t_cand,
+        'speedup': t_ref / t_cand,
+    }
+    if vad_map:
+        drift = np.abs(_vad(p_ref, labels, vad_map) - _vad(p_cand, labels, vad_map))
+        report['vad_max_drift'] = dict(zip(['Valence', 'Arousal', 'Dominance'], drift.max(axis=0).tolist()))
+        report['vad_mean_drift'] = dict(zip(['Valence', 'Arousal', 'Dominance'], drift.mean(axis=0).tolist()))
+
+    print(f"\n--- {model}: torch vs {backend} on {len(texts)} texts ---")
+    worst = sorted(report['per_label_max_abs_diff'].items(), key=lambda x: x[1], reverse=True)
+    for lbl, d in worst[:5]:
+        print(f"   {lbl:<15} max abs diff {d:.4f}")
+    print(f"   max abs diff (any label): {report['max_abs_diff']:.4f}")
+    print(f"   top label agreement: {100 * report['top_label_agreement']:.1f}%")
+    if vad_map:
+        print("   VAD drift (max / mean): " + ", ".join(
+            f"{k[0]} {report['vad_max_drift'][k]:.4f} / {report['vad_mean_drift'][k]:.4f}" for k in report['vad_max_drift']))
+    print(f"   torch {report['torch_texts_per_sec']:.1f} texts/s, {backend} "
+          f"{report[f'{backend}_texts_per_sec']:.1f} texts/s ({report['speedup']:.2f}x)")
+
+    if out_file:
+        with open(out_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved to {out_file}")
+    return report
+
+
+def sample_texts(path, n=PARITY_SAMPLE, read_rows=PARITY_READ_ROWS, seed=0):
+    """n random non-empty texts from the first read_rows rows of a csv / csv.zst / parquet."""
+    from table_io import iter_table
+    from id_set import TEXT_COLUMNS
+    chunk = next(iter_table(path, read_rows))
+    col = next((c for c in ['Clean_Text'] + TEXT_COLUMNS if c in chunk.columns), None)
+    if col is None:
+        raise ValueError(f"no text column in {path}")
+    texts = [t for t in chunk[col].dropna().astype(str) if t.strip()]
+    random.Random(seed).shuffle(texts)
+    return texts[:n]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python onnx_backend.py <csv / csv.zst / parquet with a text column> [sample size] [onnx|onnx-int8]")
+        return
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else PARITY_SAMPLE
+    backend = sys.argv[3] if len(sys.argv) > 3 else "onnx-int8"
+    from run_event_study import VAD_DICT     # the map the reddit VAD comes from
+    parity_report(sample_texts(sys.argv[1], n), backend=backend, vad_map=VAD_DICT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import os
+import sys
+import csv
+import time
+import queue
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from dump_filters import loads, make_subreddit_filter, make_time_filter
+from time_index import decompressor_for
+
+# Splits ONE huge dump (30+ GB RC_*.zst) across cores.
+#
+#   reader thread  -> decompresses and cuts the stream into ~BATCH_BYTES
+#                     blocks on line boundaries
+#   process pool   -> prefilters + json parses each block, returns rows
+#   main thread    -> writes results back out in the original order
+#
+# Backpressure: the reader can only get MAX_QUEUED blocks ahead and we only
+# keep workers * INFLIGHT_PER_WORKER blocks in the pool at once, so memory
+# stays around (queued + inflight) * BATCH_BYTES no matter how big the file is.
+
+BATCH_BYTES = 8 * 1024 * 1024
+MAX_QUEUED = 8
+INFLIGHT_PER_WORKER = 2
+HEADER = ['utc', 'date', 'subreddit', 'text', 'score']
+
+# Filled in per worker process by _init_worker (closures can't be pickled)
+_cfg = (None, None, None)
+_wanted_sub = None
+_in_range = None
+
+
+def _init_worker(subs, start_ts, end_ts):
+    global _cfg, _wanted_sub, _in_range
+    _cfg = (subs, start_ts, end_ts)
+    _wanted_sub = make_subreddit_filter(subs, ignore_case=True) if subs else None
+    _in_range = make_time_filter(start_ts, end_ts) if start_ts is not None else None
+
+
+def parse_block(block):
+    """
+    Runs in a worker. Takes a chunk of raw dump bytes (whole lines only) and
+    returns (lines_seen, rows), filtered by whatever _init_worker was given.
+    """
+    subs, start_ts, end_ts = _cfg
+    rows = []
+    lines = block.split(b"\n")
+    seen = 0
+    for line in lines:
+        if not line:
+            continue
+        seen += 1
+        if _wanted_sub and not _wanted_sub(line):
+            continue
+        if _in_range and not _in_range(line):
+            continue
+        try:
+            obj = loads(line)
+            sub = obj.get('subreddit') or ""
+            if subs and sub.lower() not in subs:
+                continue
+            ts = int(obj.get('created_utc', 0))
+            if start_ts is not None and not (start_ts <= ts <= end_ts):
+                continue
+            content = obj.get('body') or f"{obj.get('title', '')} {obj.get('selftext', '')}"
+            clean_txt = " ".join(content.split())
+            date_str = datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d')
+            rows.append([ts, date_str, sub, clean_txt, obj.get('score', 0)])
+        except Exception:
+            continue
+    return seen, rows
+
+
+def read_blocks(path, out_q, stop, batch_bytes=BATCH_BYTES, errors=None):
+    """
+    Reader thread. Pushes line-aligned byte blocks, then None when done.
+    A read error (missing file, corrupt frame) still ends the stream with
+    None, but goes into errors first so the caller can re-raise it.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if path.endswith('.zst'):
+                # big window for Pushshift dumps, .dict for raw/ archives
+                reader = decompressor_for(path).stream_reader(f)
+            else:
+                reader = f
+            leftover = b""
+            while not stop.is_set():
+                chunk = reader.read(batch_bytes)
+                if not chunk:
+                    break
+                chunk = leftover + chunk
+                cut = chunk.rfind(b"\n")
+                if cut == -1:
+                    leftover = chunk
+                    continue
+                leftover = chunk[cut + 1:]
+                out_q.put(chunk[:cut + 1])
+            if leftover and not stop.is_set():
+                out_q.put(leftover)
+    except Exception as e:
+        if errors is None:
+            raise
+        errors.append(e)
+    finally:
+        out_q.put(None)
+
+
+def run_pipeline(path, out_file=None, workers=None, subs=None, start_ts=None, end_ts=None, batch_bytes=BATCH_BYTES):
+    """
+    Parses one dump across a process pool. Writes rows (in file order) to
+    out_file if given. Returns stats dict with lines, kept, seconds, lines_per_sec.
+    """
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    subs = {s.lower() for s in subs} if subs else None
+    if start_ts is not None and end_ts is None:
+        end_ts = 2**62
+
+    blocks = queue.Queue(maxsize=MAX_QUEUED)
+    stop = threading.Event()
+    read_errors = []
+    reader = threading.Thread(target=read_blocks, args=(path, blocks, stop, batch_bytes, read_errors), daemon=True)
+
+    out_fh = open(out_file, 'w', newline='', encoding='utf-8') if out_file else None
+    writer = csv.writer(out_fh) if out_fh else None
+    if writer:
+        writer.writerow(HEADER)
+
+    lines = 0
+    kept = 0
+    next_report = 5_000_000
+    t0 = time.time()
+    reader.start()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(subs, start_ts, end_ts)) as pool:
+            inflight = []   # futures in submission order -> ordered writer
+            max_inflight = workers * INFLIGHT_PER_WORKER
+            done_reading = False
+
+            while not done_reading or inflight:
+                # top the pool up, but never past the inflight cap
+                while not done_reading and len(inflight) < max_inflight:
+                    block = blocks.get()
+                    if block is None:
+                        done_reading = True
+                        break
+                    inflight.append(pool.submit(parse_block, block))
+
+                if not inflight:
+                    continue
+                # oldest block first keeps the output in file order
+                seen, rows = inflight.pop(0).result()
+                lines += seen
+                kept += len(rows)
+                if writer and rows:
+                    writer.writerows(rows)
+
+                if lines >= next_report:
+                    next_report += 5_000_000
+                    rate = lines / max(time.time() - t0, 1e-9)
+                    sys.stdout.write(f"\r   Lines: {lines//1_000_000}M | Kept: {kept} | {rate:,.0f} lines/s")
+                    sys.stdout.flush()
+    finally:
+        stop.set()
+        # unblock the reader if it's stuck on a full queue
+        while reader.is_alive():
+            try:
+                blocks.get_nowait()
+            except queue.Empty:
+                reader.join(timeout=0.1)
+        if out_fh:
+            out_fh.close()
+
+    if read_errors:
+        # a reader that died mid-file must not look like a short, clean run
+        raise read_errors[0]
+
+    secs = time.time() - t0
+    return {"workers": workers, "lines": lines, "kept": kept, "seconds": secs,
+            "lines_per_sec": lines / secs if secs else 0.0}
+
+
+def benchmark(path, worker_counts=(1, 2, 4, 8), **filters):
+    """Runs the pipeline (no output file) at each worker count and prints lines/s."""
+    results = []
+    for n in worker_counts:
+        stats = run_pipeline(path, None, workers=n, **filters)
+        results.append(stats)
+        print(f"\nworkers={n:<3} lines={stats['lines']:>12,} kept={stats['kept']:>10,} "
+              f"{stats['seconds']:8.1f}s  {stats['lines_per_sec']:>12,.0f} lines/s")
+    base = results[0]['lines_per_sec'] if results and results[0]['lines_per_sec'] else None
+    if base:
+        print("\n--- SPEEDUP vs first run ---")
+        for r in results:
+            print(f"workers={r['workers']:<3} x{r['lines_per_sec'] / base:.2f}")
+    return results
+
+
+if __name__ == "__main__":
+    # python parallel_parse.py RC_2025-01.zst out.csv [workers] [sub1,sub2]
+    # python parallel_parse.py --bench RC_2025-01.zst [1,2,4,8] [sub1,sub2]
+    args = sys.argv[1:]
+    if len(args) >= 2 and args[0] == "--bench":
+        counts = tuple(int(x) for x in args[2].split(",")) if len(args) > 2 else (1, 2, 4, 8)
+        subs = args[3].split(",") if len(args) > 3 else None
+        benchmark(args[1], counts, subs=subs)
+    elif len(args) >= 2:
+        workers = int(args[2]) if len(args) > 2 else None
+        subs = args[3].split(",") if len(args) > 3 else None
+        stats = run_pipeline(args[0], args[1], workers=workers, subs=subs)
+        print(f"\nDone. {stats['lines']:,} lines, kept {stats['kept']:,} "
+              f"in {stats['seconds']:.1f}s ({stats['lines_per_sec']:,.0f} lines/s)")
+    else:
+        print("usage: python parallel_parse.py <dump.zst> <out.csv> [workers] [subs]")
+        print("       python parallel_parse.py --bench <dump.zst> [1,2,4,8] [subs]")
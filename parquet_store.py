@@ -0,0 +1,344 @@
+import os
+import sys
+import json
+import glob
+import hashlib
+from datetime import datetime, timezone
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from dump_filters import loads
+from time_index import open_lines
+
+# Parquet copy of the raw subreddit dumps (Kanye_comments, MacMiller_submissions...)
+# so the window scripts stop re-parsing the same JSONL over and over.
+#
+# Layout (hive style, so pyarrow finds the partitions by itself):
+#   <store>/subreddit=Kanye/year=2010/month=11/Kanye_comments-00003.parquet
+#   <store>/_manifest.json
+#
+# The manifest remembers, per source file, its size/mtime, how many bytes of
+# it are already in the store and which part files came from it. update_source()
+# uses that to only convert what was appended since last time (plain JSONL
+# only - a changed .zst gets reconverted from scratch). An append is only
+# trusted if the already-converted prefix still hashes the same (its first
+# and last PREFIX_CHECK_BYTES), so a file that was rewritten or replaced by a
+# bigger one gets rebuilt instead of having a stale tail glued on. Part files
+# are sorted by created_utc so the row-group stats prune well too.
+#
+# Reading: read_window() turns a time range into a year/month partition
+# filter plus a created_utc row filter, and only pulls the columns you ask for.
+
+STORE_DIRNAME = "parquet_store"
+MANIFEST = "_manifest.json"
+FLUSH_ROWS = 500_000
+ROW_GROUP_ROWS = 128 * 1024
+PREFIX_CHECK_BYTES = 1 << 20     # hashed at each end of the converted prefix
+
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("created_utc", pa.int64()),
+    ("score", pa.int64()),
+    ("body", pa.string()),
+    ("title", pa.string()),
+    ("selftext", pa.string()),
+    ("link_id", pa.string()),
+    ("kind", pa.string()),        # "comments" / "submissions"
+    ("source", pa.string()),      # raw file it came from, e.g. Kanye_comments
+])
+TEXT_COLUMNS = ["id", "body", "title", "selftext", "link_id"]
+
+
+def source_name(path):
+    # raw/ archives are <name>.zst, the store keys both by <name>
+    name = os.path.basename(path)
+    return name[:-4] if name.endswith(".zst") else name
+
+
+def source_kind(source):
+    name = os.path.basename(source).lower()
+    if "submission" in name:
+        return "submissions"
+    if "comment" in name:
+        return "comments"
+    return None
+
+
+def source_subreddit(source):
+    # Kanye_comments -> Kanye (only used when a record has no subreddit field)
+    return os.path.basename(source).split('_')[0]
+
+
+def _as_int(v):
+    if v is None or v == "":
+        return None
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        try:
+            return int(float(v))
+        except (TypeError, ValueError):
+            return None
+
+
+def _as_str(v):
+    if v is None:
+        return None
+    return v if isinstance(v, str) else str(v)
+
+
+def _partition(ts):
+    d = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return d.year, d.month
+
+
+def _load_manifest(store):
+    path = os.path.join(store, MANIFEST)
+    if not os.path.exists(path):
+        return {"sources": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_manifest(store, manifest):
+    path = os.path.join(store, MANIFEST)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class _PartWriter:
+    """Buffers rows per (subreddit, year, month) and writes one part file per partition on flush."""
+
+    def __init__(self, store, source, entry):
+        self.store = store
+        self.source = source
+        self.entry = entry
+        self.kind = source_kind(source)
+        self.buffers = {}
+        self.rows = 0
+
+    def add(self, data):
+        ts = _as_int(data.get('created_utc'))
+        if not ts:
+            # can't place it in a partition; the text scripts skip these too
+            return False
+        sub = _as_str(data.get('subreddit')) or source_subreddit(self.source)
+        buf = self.buffers.get((sub, *_partition(ts)))
+        if buf is None:
+            buf = self.buffers[(sub, *_partition(ts))] = {name: [] for name in SCHEMA.names}
+        buf["created_utc"].append(ts)
+        buf["score"].append(_as_int(data.get('score')))
+        for col in TEXT_COLUMNS:
+            buf[col].append(_as_str(data.get(col)))
+        buf["kind"].append(self.kind)
+        buf["source"].append(self.source)
+        self.rows += 1
+        return True
+
+    def flush(self):
+        for (sub, year, month), cols in self.buffers.items():
+            table = pa.Table.from_pydict(cols, schema=SCHEMA)
+            table = table.take(pc.sort_indices(table, sort_keys=[("created_utc", "ascending")]))
+            part_dir = os.path.join(self.store, f"subreddit={sub}", f"year={year}", f"month={month}")
+            os.makedirs(part_dir, exist_ok=True)
+            name = f"{self.source}-{self.entry['next_part']:05d}.parquet"
+            self.entry["next_part"] += 1
+            # dot-prefixed while writing, pyarrow's dataset discovery ignores those
+            tmp = os.path.join(part_dir, "." + name + ".tmp")
+            pq.write_table(table, tmp, compression="zstd", row_group_size=ROW_GROUP_ROWS)
+            os.replace(tmp, os.path.join(part_dir, name))
+            self.entry["parts"].append(os.path.relpath(os.path.join(part_dir, name), self.store))
+            self.entry["subreddits"] = sorted(set(self.entry["subreddits"]) | {sub})
+        self.entry["rows"] += self.rows
+        self.buffers = {}
+        self.rows = 0
+
+
+def _drop_parts(store, source, keep=()):
+    """Deletes part files of source that aren't in keep (orphans from a crash, or a rebuild)."""
+    keep = set(keep)
+    pattern = os.path.join(store, "subreddit=*", "year=*", "month=*", glob.escape(source) + "-*.parquet")
+    for p in glob.glob(pattern):
+        if os.path.relpath(p, store) not in keep:
+            os.remove(p)
+
+
+def _prefix_digest(path, end):
+    """Hash of the first and last PREFIX_CHECK_BYTES of path[:end]."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        h.update(f.read(min(end, PREFIX_CHECK_BYTES)))
+        tail = max(end - PREFIX_CHECK_BYTES, PREFIX_CHECK_BYTES)
+        if tail < end:
+            f.seek(tail)
+            h.update(f.read(end - tail))
+    return f"{end}:{h.hexdigest()[:16]}"
+
+
+def update_source(path, store, flush_rows=FLUSH_ROWS):
+    """
+    Brings one raw file's rows in the store up to date. Returns the number of
+    new rows written (0 if the file hasn't changed).
+    """
+    source = source_name(path)
+    manifest = _load_manifest(store)
+    st = os.stat(path)
+    entry = manifest["sources"].get(source)
+
+    if entry and entry["size"] == st.st_size and entry["mtime"] == int(st.st_mtime) and entry["done"]:
+        return 0
+
+    with open(path, 'rb') as f:
+        compressed = f.read(4) == b'\x28\xb5\x2f\xfd'
+
+    # appended-to plain file -> just convert the tail, as long as what we
+    # already converted is still there byte for byte
+    resume = (entry is not None and not compressed and st.st_size >= entry["bytes_done"]
+              and entry.get("prefix") == _prefix_digest(path, entry["bytes_done"]))
+    if entry is not None and not compressed and not resume:
+        print(f"   {source}: converted part of the file changed, rebuilding")
+    if resume:
+        _drop_parts(store, source, keep=entry["parts"])
+        start = entry["bytes_done"]
+    else:
+        _drop_parts(store, source)
+        entry = {"bytes_done": 0, "rows": 0, "parts": [], "subreddits": [], "next_part": 0}
+        start = 0
+    entry.update({"size": st.st_size, "mtime": int(st.st_mtime), "done": False})
+    manifest["sources"][source] = entry
+
+    writer = _PartWriter(store, source, entry)
+    before = entry["rows"]
+    errors = 0
+
+    def commit(offset):
+        writer.flush()
+        entry["bytes_done"] = offset
+        entry["prefix"] = _prefix_digest(path, offset)
+        _save_manifest(store, manifest)
+
+    if compressed:
+        with open_lines(path) as f:
+            for line in f:
+                try:
+                    writer.add(loads(line))
+                except Exception:
+                    errors += 1
+                if writer.rows >= flush_rows:
+                    writer.flush()
+        offset = st.st_size
+    else:
+        offset = start
+        with open(path, 'rb') as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # half-written last line; pick it up on the next update
+                    break
+                offset += len(line)
+                try:
+                    writer.add(loads(line))
+                except Exception:
+                    errors += 1
+                if writer.rows >= flush_rows:
+                    commit(offset)
+
+    entry["done"] = True
+    commit(offset)
+    added = entry["rows"] - before
+    print(f"   {source}: +{added} rows ({entry['rows']} total, {errors} unparseable lines)")
+    return added
+
+
+def update_store(raw_dir, store=None, sources=None):
+    """Converts/updates every raw subreddit file in raw_dir (or just `sources`)."""
+    store = store or os.path.join(raw_dir, STORE_DIRNAME)
+    os.makedirs(store, exist_ok=True)
+    if sources is None:
+        sources = sorted(f for f in os.listdir(raw_dir)
+                         if os.path.isfile(os.path.join(raw_dir, f)) and source_kind(f)
+                         and ("." not in f or f.endswith(".zst")))
+    total = 0
+    for s in sources:
+        total += update_source(os.path.join(raw_dir, s), store)
+    return total
+
+
+def is_fresh(store, path):
+    """True if path is in the store and hasn't changed since it was converted."""
+    if not store or not os.path.isdir(store):
+        return False
+    entry = _load_manifest(store)["sources"].get(source_name(path))
+    if not entry or not entry["done"]:
+        return False
+    if not os.path.exists(path):
+        # raw file's been deleted, the store is all we have
+        return True
+    st = os.stat(path)
+    return entry["size"] == st.st_size and entry["mtime"] == int(st.st_mtime)
+
+
+def _month_filter(start_ts, end_ts):
+    (y0, m0), (y1, m1) = _partition(max(int(start_ts), 0)), _partition(max(int(end_ts), 0))
+    year, month = ds.field("year"), ds.field("month")
+    after = (year > y0) | ((year == y0) & (month >= m0))
+    before = (year < y1) | ((year == y1) & (month <= m1))
+    return after & before
+
+
+def _spans_filter(spans):
+    expr = None
+    for start_ts, end_ts in spans:
+        e = _month_filter(start_ts, end_ts)
+        e &= (ds.field("created_utc") >= int(start_ts)) & (ds.field("created_utc") <= int(end_ts))
+        expr = e if expr is None else (expr | e)
+    return expr
+
+
+def read_spans(store, spans, columns=None, subreddits=None, sources=None):
+    """
+    Rows whose created_utc falls in any of the (start_ts, end_ts) spans, as
+    a pyarrow Table (each row once). columns=None gives every stored column;
+    the partition columns (subreddit/year/month) only come back if you ask.
+    """
+    dataset = ds.dataset(store, format="parquet", partitioning="hive")
+    expr = _spans_filter(spans)
+    if subreddits:
+        expr &= ds.field("subreddit").isin(list(subreddits))
+    if sources:
+        expr &= ds.field("source").isin(list(sources))
+    return dataset.to_table(columns=columns or SCHEMA.names, filter=expr)
+
+
+def read_window(store, start_ts, end_ts, columns=None, subreddits=None, sources=None):
+    return read_spans(store, [(start_ts, end_ts)], columns, subreddits, sources)
+
+
+def iter_spans_records(store, spans, source, columns=None):
+    """Dicts for one raw file's rows in any of the spans - the store version of time_index.iter_spans_lines."""
+    source = source_name(source)
+    entry = _load_manifest(store)["sources"].get(source)
+    if not entry or not entry["subreddits"]:
+        return
+    table = read_spans(store, spans, columns=columns, subreddits=entry["subreddits"], sources=[source])
+    for batch in table.to_batches():
+        yield from batch.to_pylist()
+
+
+def iter_window_records(store, start_ts, end_ts, source, columns=None):
+    return iter_spans_records(store, [(start_ts, end_ts)], source, columns)
+
+
+if __name__ == "__main__":
+    # python parquet_store.py <raw_dir> [store_dir]     -> convert / incrementally update
+    if len(sys.argv) < 2:
+        print("usage: python parquet_store.py <raw_dir> [store_dir]")
+        sys.exit(1)
+    raw = sys.argv[1]
+    added = update_store(raw, sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Done. {added} new rows.")
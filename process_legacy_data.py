@@ -1,10 +1,13 @@
-import json
 import os
 import pandas as pd
 import torch
-from transformers import pipeline
 from tqdm import tqdm
 from datetime import datetime
+from window_query import extract_targets, post_text
+from time_index import find_raw
+from id_set import scored_ids, drop_seen
+from onnx_backend import load_classifier
+from token_windows import score_windows
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -31,8 +34,8 @@ device = 0 if torch.cuda.is_available() else -1
 
 def process_legacy_data():
     print("Loading GoEmotions AI Model...")
-    classifier = pipeline(
-        task="text-classification", 
+    # torch by default; EMOTION_BACKEND=onnx / onnx-int8 runs it on ONNX Runtime (onnx_backend.py)
+    classifier = load_classifier(
         model="SamLowe/roberta-base-go_emotions", 
         top_k=None, 
         device=device,
@@ -43,43 +46,48 @@ def process_legacy_data():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
         
-    for raw_file, start_utc, end_utc, artist in TARGETS:
-        input_path = os.path.join(RAW_DIR, raw_file)
-        if not os.path.exists(input_path):
+    # both Kanye files and both Mac files, every window answered in one pass each
+    found = extract_targets(TARGETS, RAW_DIR)
+        
+    for target in TARGETS:
+        raw_file, start_utc, end_utc, artist = target
+        # plain file or its .zst archive
+        if find_raw(os.path.join(RAW_DIR, raw_file)) is None:
             print(f"Skipping {raw_file} - not found.")
             continue
             
         print(f"\n--- Extracting {artist} from {raw_file} ---")
         extracted = []
         
-        with open(input_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    data = json.loads(line)
-                    utc = data.get('created_utc')
-                    if utc and start_utc <= int(utc) <= end_utc:
-                        text = data.get('body') or data.get('selftext') or data.get('title') or ""
-                        if text not in ['[removed]', '[deleted]', '']:
-                            # format identically to your _FullDist files
-                            date_str = datetime.utcfromtimestamp(int(utc)).strftime('%Y-%m-%d %H:%M:%S')
-                            extracted.append({'Date': date_str, 'Comment': text})
-                except Exception:
-                    continue
+        for data in found[target]:
+            # format identically to your _FullDist files
+            date_str = datetime.utcfromtimestamp(int(data['created_utc'])).strftime('%Y-%m-%d %H:%M:%S')
+            extracted.append({'Date': date_str, 'Comment': post_text(data)})
                     
         if not extracted:
             print("No valid posts found in window.")
             continue
             
-        df = pd.DataFrame(extracted)
-        print(f"Found {len(df)} posts. Running AI analysis...")
+        # skip whatever a previous run (or another script) already scored into this FullDist
+        out_name = f"{artist}_FullDist.csv"
+        ids = scored_ids(OUTPUT_DIR, out_name)
+        df = drop_seen(pd.DataFrame(extracted), ids)
+        if df.empty:
+            print(f"All {len(extracted)} posts are already in {out_name}.")
+            ids.close()
+            continue
+        keys = df.pop('_key').tolist()
+        print(f"Found {len(df)} new posts ({len(extracted) - len(df)} already scored). Running AI analysis...")
         
         texts = df['Comment'].tolist()
-        batch_size = 100
+        # rows per call; the classifier re-batches them by token length
+        batch_size = 2000
         all_results = []
         
         for i in tqdm(range(0, len(texts), batch_size)):
             batch = texts[i:i+batch_size]
-            results = classifier(batch)
+            # long posts are scored over token windows instead of being truncated at 512
+            results, _ = score_windows(classifier, batch)
             for res in results:
                 emotion_dict = {score['label']: score['score'] for score in res}
                 all_results.append(emotion_dict)
@@ -87,11 +95,15 @@ def process_legacy_data():
         emotions_df = pd.DataFrame(all_results)
         final_df = pd.concat([df.reset_index(drop=True), emotions_df.reset_index(drop=True)], axis=1)
         
-        out_path = os.path.join(OUTPUT_DIR, f"{artist}_FullDist.csv")
+        out_path = os.path.join(OUTPUT_DIR, out_name)
         file_exists = os.path.exists(out_path)
         
         final_df.to_csv(out_path, mode='a', header=not file_exists, index=False)
-        print(f"Appended {len(final_df)} analyzed rows to {artist}_FullDist.csv")
+        ids.add_all(keys)
+        ids.commit()
+        ids.close()
+        print(f"Appended {len(final_df)} analyzed rows to {out_name}")
+        classifier.report()
 
 if __name__ == "__main__":
     process_legacy_data()
\ No newline at end of file
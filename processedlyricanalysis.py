@@ -5,8 +5,9 @@ import sys
 import spacy
 import csv
 import numpy as np
-import statistics
 from transformers import pipeline
+from score_cache import cached
+from lyric_scoring import score_songs, summarize_album
 from tqdm import tqdm
 
 # --- CONFIGURATION ---
@@ -163,72 +164,26 @@ def main():
 
     # 2. LOAD MODEL
     print("Loading J-Hartmann Model...")
-    classifier = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", return_all_scores=True)
+    classifier = cached(pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", return_all_scores=True))
     
-    album_data = {} # Aggregator
-
     print("Starting Analysis (VAD Calculation + Complex Translation)...")
-    
+    # Windowing because BERT models have a 512 token limit. Every window of every
+    # song is scored in one batched pass, then averaged back per song and
+    # TRANSLATED: averaged VAD -> 28 Complex Emotions
+    songs = score_songs(classifier, df['Clean_Lyrics'].tolist(), VAD_MAP,
+                        dominant_of=lambda s: get_complex_emotion(s['v'], s['a'], s['d']))
+
+    album_data = {} # Aggregator
     with open(SONG_OUTPUT, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
         writer.writerow(['Artist', 'Album', 'Title', 'Valence', 'Arousal', 'Dominance', 'Complex_Emotion'])
         
-        # Iterate and Process
-        for index, row in tqdm(df.iterrows(), total=len(df), desc="Analyzing"):
-            text = row['Clean_Lyrics']
+        for (_, row), song in zip(df.iterrows(), songs):
+            if song is None: continue
+            writer.writerow([row['Artist'], row['Album'], row['Title'], song['v'], song['a'], song['d'], song['dominant']])
             
-            # Chunking because BERT models have a 512 token limit
-            chunks = [text[i:i+512] for i in range(0, len(text), 512)]
-            
-            total_v, total_a, total_d = 0, 0, 0
-            valid_chunks = 0
-            
-            for chunk in chunks:
-                if len(chunk) < 10: continue
-                try:
-                    # Get model probabilities for the 7 basic emotions
-                    results = classifier(chunk)[0]
-                    
-                    # Convert those 7 basic probs into VAD coordinates
-                    # using the coordinates of the 7 basic emotions in our map
-                    chunk_v, chunk_a, chunk_d = 0, 0, 0
-                    
-                    for res in results:
-                        label = res['label'] # e.g., 'joy', 'sadness'
-                        score = res['score']
-                        
-                        # We only use the dictionary keys that match the model's output
-                        if label in VAD_MAP:
-                            coords = VAD_MAP[label]
-                            chunk_v += coords[0] * score
-                            chunk_a += coords[1] * score
-                            chunk_d += coords[2] * score
-                            
-                    total_v += chunk_v
-                    total_a += chunk_a
-                    total_d += chunk_d
-                    valid_chunks += 1
-                except: continue
-            
-            if valid_chunks > 0:
-                avg_v = total_v / valid_chunks
-                avg_a = total_a / valid_chunks
-                avg_d = total_d / valid_chunks
-                
-                # TRANSLATE: Convert averaged VAD -> 28 Complex Emotions
-                complex_emo = get_complex_emotion(avg_v, avg_a, avg_d)
-                
-                writer.writerow([row['Artist'], row['Album'], row['Title'], avg_v, avg_a, avg_d, complex_emo])
-                
-                # Save for album stats
-                key = (row['Artist'], row['Album'])
-                if key not in album_data: 
-                    album_data[key] = {'v':[], 'a':[], 'd':[], 'emotions':[]}
-                
-                album_data[key]['v'].append(avg_v)
-                album_data[key]['a'].append(avg_a)
-                album_data[key]['d'].append(avg_d)
-                album_data[key]['emotions'].append(complex_emo)
+            # Save for album stats
+            album_data.setdefault((row['Artist'], row['Album']), []).append(song)
 
     # 3. ALBUM AGGREGATION
     print("Generating Album Summaries...")
@@ -236,21 +191,11 @@ def main():
         writer = csv.writer(f)
         writer.writerow(['Artist', 'Album', 'Avg_Valence', 'Avg_Arousal', 'Avg_Dominance', 'Primary_Emotion', 'Song_Count'])
         
-        for (artist, album), stats in album_data.items():
-            if not stats['v']: continue
-            
-            avg_v = statistics.mean(stats['v'])
-            avg_a = statistics.mean(stats['a'])
-            avg_d = statistics.mean(stats['d'])
-            
-            # Determine primary emotion by Mode (most frequent)
-            # If tie, recalculate nearest neighbor based on album average VAD
-            try:
-                primary = statistics.mode(stats['emotions'])
-            except:
-                primary = get_complex_emotion(avg_v, avg_a, avg_d)
-                
-            writer.writerow([artist, album, avg_v, avg_a, avg_d, primary, len(stats['v'])])
+        for (artist, album), album_songs in album_data.items():
+            # Primary emotion by Mode (most frequent); if that fails,
+            # nearest neighbor of the album average VAD
+            avg_v, avg_a, avg_d, primary, count = summarize_album(album_songs, tie_break=get_complex_emotion)
+            writer.writerow([artist, album, avg_v, avg_a, avg_d, primary, count])
             print(f" > {album}: {primary.upper()}")
 
     print(f"Done. Song data saved to {SONG_OUTPUT}")
@@ -1,10 +1,15 @@
-import json
 import csv
 import datetime
 import re
 import os
 import emoji
 from tqdm import tqdm
+from dump_filters import loads, make_windows_filter
+from release_windows import WindowIndex
+from time_index import find_raw, open_lines
+from table_io import RowSink
+from sampler import StratifiedSampler, save_rates, WEIGHT_COLUMN
+from id_set import IdSet, DedupeWriter, row_key, SEEN_DB
 
 
 INPUT_DIRECTORY = r"D:\Lyrics-Fanbase-Correlator\Lyric-Fanbase-Correlator\raw"
@@ -25,6 +30,12 @@ OUTPUT_DIRECTORY = "Processed_Artist_Data"
 WINDOW_PRE = 14
 WINDOW_POST = 14
 
+# Max rows kept per artist per day (None = keep everything). Sampling is by
+# hash of the post id, so reruns pick the same rows; see sampler.py.
+SAMPLE_CAP_PER_DAY = None
+# sampled rows get an extra Sample_Weight column (seen/kept for their day)
+FILTERED_HEADER = ['id', 'Artist', 'Album', 'Date', 'Text', 'Score']
+
 # Artist Mapping for RAW files
 FILENAME_MAP = {
     "playboicarti": "Playboi Carti",
@@ -131,11 +142,6 @@ def get_artist_windows(artist_key):
         except ValueError: continue
     return windows
 
-def check_window(created_utc, windows):
-    for w in windows:
-        if w["start_ts"] <= created_utc <= w["end_ts"]: return w["album"]
-    return None
-
 def clean_text(text):
     text = emoji.replace_emoji(text, replace='')
     text = re.sub(r'\[.*?\]\(.*?\)', '', text)
@@ -152,23 +158,28 @@ def is_spam_or_bot(text):
 def process_raw_files(artist_name, file_prefix, windows, writer):
     # Process old JSONL files from the 'raw' folder
     target_files = [f"{file_prefix}_comments", f"{file_prefix}_submissions"]
+    index = WindowIndex(windows)
     count = 0
     
     for fname in target_files:
-        full_path = os.path.join(INPUT_DIRECTORY, fname)
-        if not os.path.exists(full_path): continue
+        # plain JSONL or its re-encoded .zst archive
+        full_path = find_raw(os.path.join(INPUT_DIRECTORY, fname))
+        if not full_path: continue
         
-        print(f"    Reading RAW: {fname}...")
+        print(f"    Reading RAW: {os.path.basename(full_path)}...")
+        # skip out-of-window lines on the raw bytes, only decode survivors
+        in_window = make_windows_filter(index)
         try:
-            with open(full_path, 'r', encoding='utf-8') as f:
+            with open_lines(full_path) as f:
                 # Using tqdm here for large raw files
                 for line in tqdm(f, desc=f"Scanning {fname}", unit="lines"):
                     if not line.strip(): continue
+                    if not in_window(line): continue
                     try:
-                        obj = json.loads(line)
+                        obj = loads(line)
                         created = int(obj.get('created_utc', 0))
                         
-                        rel_album = check_window(created, windows)
+                        rel_album = index.first(created)
                         if not rel_album: continue
                         
                         body = obj.get('body') or obj.get('selftext') or obj.get('title') or ""
@@ -188,6 +199,7 @@ def process_csv_files(artist_name, windows, writer):
     # Process new 2025 CSV files
     if artist_name not in CSV_SOURCES: return 0
     
+    index = WindowIndex(windows)
     count = 0
     for csv_path in CSV_SOURCES[artist_name]:
         if not os.path.exists(csv_path): 
@@ -208,7 +220,7 @@ def process_csv_files(artist_name, windows, writer):
                         else:
                             continue
 
-                        rel_album = check_window(created, windows)
+                        rel_album = index.first(created)
                         if not rel_album: continue
 
                         body = row.get('body') or row.get('text') or row.get('selftext') or row.get('title') or ""
@@ -244,5 +256,30 @@ def main():
 
         print(f"--> Processing {artist_name}...")
         
-        with open(output_filename, 'w', newline='', encoding='utf-8') as out_file:
-            writer = csv.writer(out_file)
\ No newline at end of file
+        # rows are batched and the file only shows up once the artist is complete
+        # the raw dumps and the 2025 CSVs overlap, so every row goes through the
+        # id set first; the file is rebuilt from scratch, so is its scope
+        with IdSet(os.path.join(OUTPUT_DIRECTORY, SEEN_DB), f"filtered:{artist_name}") as ids, \
+                RowSink(output_filename, FILTERED_HEADER + ([WEIGHT_COLUMN] if SAMPLE_CAP_PER_DAY else [])) as out:
+            ids.reset()
+            writer = out
+            if SAMPLE_CAP_PER_DAY:
+                # rows are [id, artist, album, date, ...]
+                writer = StratifiedSampler(SAMPLE_CAP_PER_DAY, lambda r: (r[1], r[3]), lambda r: r[0])
+            dedupe = DedupeWriter(writer, ids, lambda r: row_key(r[0], r[4]))
+            raw_count = process_raw_files(artist_name, file_prefix, windows, dedupe)
+            csv_count = process_csv_files(artist_name, windows, dedupe)
+            if SAMPLE_CAP_PER_DAY:
+                kept = writer.write_to(out, weighted=True)
+                save_rates(writer.rates(), OUTPUT_DIRECTORY)
+                print(f"    Sampled {kept} of {raw_count + csv_count - dedupe.dropped} rows (cap {SAMPLE_CAP_PER_DAY}/day).")
+            # scope is reset every run anyway, so it can go before the file is published
+            ids.commit()
+
+        print(f"    Finished {artist_name}. Saved {raw_count + csv_count - dedupe.dropped} rows "
+              f"({raw_count} raw, {csv_count} csv, {dedupe.dropped} duplicates dropped).")
+
+    print("\nAll artists processed.")
+
+if __name__ == "__main__":
+    main()
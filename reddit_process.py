@@ -1,13 +1,19 @@
 import pandas as pd
-from transformers import pipeline
 import torch
 import re
 import os
 from tqdm import tqdm
+from table_io import find_tables, read_table
+from id_set import scored_ids, drop_seen
+from onnx_backend import load_classifier
+from token_windows import score_windows
+from sampler import WEIGHT_COLUMN
 
 SOURCE_DIR = r"D:\Lyrics-Fanbase-Correlator\Processed_Artist_Data"
 FINAL_OUTPUT_DIR = r"D:\Lyrics-Fanbase-Correlator\Final_Analysis_Results"
-CHUNK_SIZE = 400
+# rows per scoring call / append; inside a call the texts are re-batched by
+# token length (token_batches.py), so bigger chunks mean less padding
+CHUNK_SIZE = 2000
 
 SUBREDDIT_MAP = {
     "taylorswift": "Taylor Swift", "sabrinacarpenter": "Sabrina Carpenter",
@@ -21,7 +27,9 @@ SUBREDDIT_MAP = {
 def setup_classifier():
     device = 0 if torch.cuda.is_available() else -1
     print("Loading GoEmotions AI Model...")
-    return pipeline("text-classification", model="SamLowe/roberta-base-go_emotions", top_k=None, device=device)
+    # repeats (copypasta, reruns) come out of the score cache instead of the model;
+    # EMOTION_BACKEND=onnx / onnx-int8 runs it on ONNX Runtime (onnx_backend.py)
+    return load_classifier(model="SamLowe/roberta-base-go_emotions", top_k=None, device=device)
 
 def clean_text(text):
     if not isinstance(text, str): return ""
@@ -47,8 +55,8 @@ def main():
 
     classifier = setup_classifier()
     
-    # strictly target filtered files
-    all_files = [f for f in os.listdir(SOURCE_DIR) if f.endswith(".csv") and "filtered" in f.lower()]
+    # strictly target filtered files (.csv, .csv.zst or .parquet)
+    all_files = find_tables(SOURCE_DIR, contains="filtered")
     artist_file_groups = {}
     
     for f in all_files:
@@ -66,13 +74,15 @@ def main():
         for f in files:
             print(f"Reading {f}...")
             path = os.path.join(SOURCE_DIR, f)
-            df = pd.read_csv(path, on_bad_lines='skip', low_memory=False)
+            df = read_table(path, on_bad_lines='skip', low_memory=False)
             
             text_col = next((c for c in ['Text', 'body', 'selftext', 'body_text', 'comment_body', 'text'] if c in df.columns), None)
             date_col = next((c for c in ['Date', 'created_utc', 'timestamp', 'created', 'date'] if c in df.columns), None)
 
             if text_col and date_col:
-                temp_df = df[[text_col, date_col]].copy()
+                # sampled filtered files carry a per-row weight, keep it through scoring
+                keep = [text_col, date_col] + ([WEIGHT_COLUMN] if WEIGHT_COLUMN in df.columns else [])
+                temp_df = df[keep].copy()
                 temp_df = temp_df.rename(columns={text_col: 'Text', date_col: 'Date'})
                 
                 if df[date_col].dtype != 'object':
@@ -90,35 +100,51 @@ def main():
 
         master_df = pd.concat(merged_data).dropna(subset=['Text', 'Date'])
         
+        # duplicates within the files and anything already in the FullDist
+        # (from an earlier run or another script) are dropped before scoring;
+        # this replaces resuming by row count, which broke when inputs changed
+        ids = scored_ids(FINAL_OUTPUT_DIR, os.path.basename(out_path))
         original_count = len(master_df)
-        master_df = master_df.drop_duplicates(subset=['Text'])
-        new_count = len(master_df)
-        if original_count != new_count:
-            print(f"Dropped {original_count - new_count} duplicate posts.")
-        
-        start_row = 0
-        if os.path.exists(out_path):
-            existing = pd.read_csv(out_path, usecols=['Date'])
-            start_row = len(existing)
-            print(f"Resuming {artist} from row {start_row}...")
+        master_df = drop_seen(master_df, ids)
+        if original_count != len(master_df):
+            print(f"Dropped {original_count - len(master_df)} duplicate or already scored posts.")
 
         total_rows = len(master_df)
-        if start_row >= total_rows:
+        if not total_rows:
             print(f"Already finished {artist}. Skipping.")
+            ids.close()
             continue
 
-        for i in tqdm(range(start_row, total_rows, CHUNK_SIZE), desc=f"Processing {artist}"):
+        for i in tqdm(range(0, total_rows, CHUNK_SIZE), desc=f"Processing {artist}"):
             chunk = master_df.iloc[i : i + CHUNK_SIZE].copy()
+            keys = chunk.pop('_key').tolist()
             chunk['Clean_Text'] = chunk['Text'].apply(clean_text)
             chunk = chunk[chunk['Clean_Text'] != ""]
-            if chunk.empty: continue
+            if chunk.empty:
+                ids.add_all(keys)
+                ids.commit()
+                continue
             
-            results = classifier(chunk['Clean_Text'].tolist(), truncation=True, max_length=512)
+            # long posts are scored over token windows instead of being truncated at 512
+            results, _ = score_windows(classifier, chunk['Clean_Text'].tolist())
             dist_list = [{item['label']: item['score'] for item in res} for res in results]
             dist_df = pd.DataFrame(dist_list).set_index(chunk.index)
             
             final_chunk = pd.concat([chunk, dist_df], axis=1)
+            if WEIGHT_COLUMN in final_chunk.columns:
+                # rows from unsampled files in the same chunk count once
+                final_chunk[WEIGHT_COLUMN] = final_chunk[WEIGHT_COLUMN].fillna(1.0)
+            if os.path.exists(out_path):
+                # appending: line up with the columns the file already has
+                header = pd.read_csv(out_path, nrows=0).columns
+                if WEIGHT_COLUMN in final_chunk.columns and WEIGHT_COLUMN not in header:
+                    print(f"   [!] {os.path.basename(out_path)} has no {WEIGHT_COLUMN} column, sampled rows go in unweighted")
+                final_chunk = final_chunk.reindex(columns=header)
             final_chunk.to_csv(out_path, mode='a', header=not os.path.exists(out_path), index=False)
+            ids.add_all(keys)
+            ids.commit()
+        ids.close()
+        classifier.report()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
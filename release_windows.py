@@ -0,0 +1,121 @@
+import bisect
+import datetime
+import numpy as np
+
+# Compiled lookup for "which release window(s) is this timestamp in?".
+#
+# check_window() walks every window for every line, which is fine with 3
+# albums per artist but turns into the hot loop once we add track-level
+# and single drops (hundreds of windows each). Here we cut the timeline
+# into elementary segments at every window edge, precompute which windows
+# cover each segment, and then any lookup is one bisect.
+
+
+class WindowIndex:
+    """
+    windows: list of {"album": .., "start_ts": .., "end_ts": ..} dicts, same
+    shape get_artist_windows() returns. Bounds are inclusive on both ends,
+    matching check_window(). Overlapping windows are fine.
+    """
+
+    def __init__(self, windows):
+        self.windows = list(windows)
+        if not self.windows:
+            self.points = []
+            self.segments = []
+            self._np_points = np.array([], dtype=np.int64)
+            return
+
+        # end + 1 because ends are inclusive and segments are half-open
+        edges = set()
+        for w in self.windows:
+            edges.add(int(w["start_ts"]))
+            edges.add(int(w["end_ts"]) + 1)
+        self.points = sorted(edges)
+
+        # segments[i] covers [points[i], points[i+1]) and holds the indices of
+        # every window over it, in the original order so .first() agrees with
+        # the old check_window() when windows overlap
+        self.segments = []
+        for p in self.points:
+            hits = tuple(i for i, w in enumerate(self.windows) if w["start_ts"] <= p <= w["end_ts"])
+            self.segments.append(hits)
+
+        self._np_points = np.asarray(self.points, dtype=np.int64)
+        self.min_ts = self.points[0]
+        self.max_ts = self.points[-1] - 1
+
+    @classmethod
+    def from_album_dates(cls, album_dates, pre_days, post_days):
+        """Builds the index straight from an {album: "YYYY-MM-DD"} catalog."""
+        windows = []
+        for album, date_str in album_dates.items():
+            try:
+                dt = datetime.datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+            except ValueError:
+                continue
+            windows.append({
+                "album": album,
+                "start_ts": int((dt - datetime.timedelta(days=pre_days)).timestamp()),
+                "end_ts": int((dt + datetime.timedelta(days=post_days)).timestamp()),
+            })
+        return cls(windows)
+
+    def __len__(self):
+        return len(self.windows)
+
+    def _segment(self, ts):
+        i = bisect.bisect_right(self.points, ts) - 1
+        if i < 0:
+            return ()
+        return self.segments[i]
+
+    def contains(self, ts):
+        return bool(self._segment(ts))
+
+    def first(self, ts):
+        """Drop-in for check_window(): album name of the first matching window, or None."""
+        hits = self._segment(ts)
+        if not hits:
+            return None
+        return self.windows[hits[0]]["album"]
+
+    def lookup(self, ts):
+        """Every album whose window covers ts (empty list if none)."""
+        return [self.windows[i]["album"] for i in self._segment(ts)]
+
+    def lookup_windows(self, ts):
+        """Like lookup() but hands back the full window dicts."""
+        return [self.windows[i] for i in self._segment(ts)]
+
+    def segment_ids(self, timestamps):
+        """
+        Batch version for whole arrays of timestamps. Returns an int array of
+        segment ids (-1 = before the first window). Pair with albums_for_segment().
+        """
+        ts = np.asarray(timestamps, dtype=np.int64)
+        return np.searchsorted(self._np_points, ts, side="right") - 1
+
+    def albums_for_segment(self, seg_id):
+        if seg_id < 0:
+            return []
+        return [self.windows[i]["album"] for i in self.segments[seg_id]]
+
+    def mask(self, timestamps):
+        """Boolean array: True where the timestamp is inside at least one window."""
+        seg = self.segment_ids(timestamps)
+        if not self.segments:
+            return np.zeros(len(seg), dtype=bool)
+        covered = np.array([bool(s) for s in self.segments], dtype=bool)
+        return (seg >= 0) & covered[np.clip(seg, 0, None)]
+
+    def first_many(self, timestamps):
+        """Batch .first(): object array of album names (None where nothing matches)."""
+        seg = self.segment_ids(timestamps)
+        names = np.array([self.windows[s[0]]["album"] if s else None for s in self.segments] + [None], dtype=object)
+        # -1 (before everything) maps onto the trailing None
+        return names[np.where(seg >= 0, seg, len(self.segments))]
+
+    def lookup_many(self, timestamps):
+        """Batch .lookup(): one list of albums per timestamp."""
+        return [self.albums_for_segment(s) for s in self.segment_ids(timestamps)]
@@ -0,0 +1,129 @@
+import os
+import json
+from time_index import decompressor_for
+
+# Resumable line reader for .zst dumps.
+#
+# zstd can't restart in the middle of a frame (the decompressor state isn't
+# something we can save), but it CAN restart at any frame boundary. So while
+# streaming we keep track of where each frame starts in the compressed file
+# and how far into that frame's output the last finished line ends. A
+# checkpoint is (frame_offset, frame_index, bytes_into_frame) plus whatever
+# the caller wants to remember (rows written, output file size).
+#
+# On restart we seek straight to frame_offset and throw away bytes_into_frame
+# bytes of output WITHOUT splitting or parsing them.
+#   - multi-frame files (pzstd output, time_index.reencode_seekable archives):
+#     we only redo the tail of one frame (dictionary-compressed raw/ archives
+#     included, decompressor_for() finds their .dict)
+#   - single-frame files (most Pushshift monthlies): we still have to
+#     decompress from the start, but skipping is a memcpy, not json.loads
+
+READ_BYTES = 4 * 1024 * 1024
+
+
+def iter_lines(path, frame_offset=0, frame_index=0, skip_bytes=0):
+    """
+    Yields (line_bytes, (frame_offset, frame_index, bytes_into_frame)) where
+    the position is right after that line - i.e. exactly what you'd pass
+    back in to resume after it.
+    """
+    dctx = decompressor_for(path)
+    with open(path, 'rb') as f:
+        f.seek(frame_offset)
+        comp_pos = frame_offset          # compressed bytes read so far
+        cur_offset = frame_offset        # where the current frame starts
+        cur_index = frame_index
+        produced = 0                     # output bytes of the current frame so far
+        to_skip = skip_bytes
+        carry = b""                      # partial line waiting for its newline
+        dobj = dctx.decompressobj()
+
+        while True:
+            chunk = f.read(READ_BYTES)
+            if not chunk:
+                break
+            comp_pos += len(chunk)
+
+            while chunk:
+                out = dobj.decompress(chunk)
+                chunk = b""
+                frame_done = dobj.eof
+                if frame_done:
+                    chunk = dobj.unused_data
+
+                # resume: drop output we already handled last time
+                if to_skip:
+                    drop = min(to_skip, len(out))
+                    out = out[drop:]
+                    produced += drop
+                    to_skip -= drop
+
+                start = 0
+                while True:
+                    nl = out.find(b"\n", start)
+                    if nl == -1:
+                        break
+                    line = carry + out[start:nl + 1] if carry else out[start:nl + 1]
+                    carry = b""
+                    yield line, (cur_offset, cur_index, produced + nl + 1)
+                    start = nl + 1
+                if start < len(out):
+                    carry += out[start:]
+                produced += len(out)
+
+                if frame_done:
+                    # next frame starts right after this one's last byte
+                    cur_offset = comp_pos - len(chunk)
+                    cur_index += 1
+                    produced = 0
+                    dobj = dctx.decompressobj()
+
+        if carry:
+            # file didn't end in a newline
+            yield carry, (cur_offset, cur_index, produced)
+
+
+class Checkpoint:
+    """
+    Small JSON manifest next to an output file. save() is atomic
+    (tmp + rename) so a preemption mid-write can't leave it half written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.state = json.load(f)
+            except (OSError, ValueError):
+                self.state = None
+
+    @property
+    def done(self):
+        return bool(self.state and self.state.get("done"))
+
+    def position(self):
+        """(frame_offset, frame_index, skip_bytes) to resume from."""
+        if not self.state:
+            return 0, 0, 0
+        return self.state["frame_offset"], self.state["frame_index"], self.state["skip_bytes"]
+
+    def save(self, pos, done=False, **extra):
+        frame_offset, frame_index, skip_bytes = pos
+        state = {"frame_offset": frame_offset, "frame_index": frame_index,
+                 "skip_bytes": skip_bytes, "done": done}
+        state.update(extra)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.state = state
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.state = None
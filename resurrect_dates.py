@@ -1,7 +1,7 @@
-import pandas as pd
 import os
 import gc
 import warnings
+from table_io import is_table, read_table, write_table
 warnings.filterwarnings('ignore')
 
 DIR = r"D:\Lyrics-Fanbase-Correlator\Processed_Artist_Data"
@@ -12,10 +12,11 @@ def resurrect_unix_times():
     
     # scan every file to build the dictionary
     for f in os.listdir(DIR):
-        if f.endswith("_Filtered.csv") or f.endswith("_COMMENTS.csv"):
+        # .csv, .csv.zst or .parquet
+        if is_table(f, ["_Filtered.csv", "_COMMENTS.csv"]):
             path = os.path.join(DIR, f)
             try:
-                df = pd.read_csv(path, low_memory=False, on_bad_lines='skip')
+                df = read_table(path, low_memory=False, on_bad_lines='skip')
                 
                 cols_lower = {str(c).lower().strip(): c for c in df.columns}
                 text_col = next((cols_lower[c] for c in ['comment', 'body', 'selftext', 'title', 'text', 'content'] if c in cols_lower), None)
@@ -39,12 +40,12 @@ def resurrect_unix_times():
 
     # inject them into the MASTER files
     for f in os.listdir(DIR):
-        if f.endswith("_MASTER.csv"):
+        if is_table(f, ["_MASTER.csv"]):
             path = os.path.join(DIR, f)
             print(f"\nInjecting Unix times into {f}...")
             
             try:
-                df_mast = pd.read_csv(path, low_memory=False, on_bad_lines='skip')
+                df_mast = read_table(path, low_memory=False, on_bad_lines='skip')
                 
                 mast_cols_lower = {str(c).lower().strip(): c for c in df_mast.columns}
                 mast_text_col = next((mast_cols_lower[c] for c in ['comment', 'body', 'selftext', 'title', 'text', 'content'] if c in mast_cols_lower), None)
@@ -58,7 +59,8 @@ def resurrect_unix_times():
                 matched = df_mast['created_utc'].notna().sum()
                 print(f"Resurrected {matched} / {len(df_mast)} timestamps.")
                 
-                df_mast.to_csv(path, index=False)
+                # written back in whatever format it came in
+                write_table(df_mast, path)
                 del df_mast
                 gc.collect()
             except Exception as e:
@@ -2,7 +2,10 @@ import pandas as pd
 import os
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy.stats import pearsonr, ttest_ind
+import numpy as np
+from scipy.stats import pearsonr, ttest_ind, t as t_dist
+from sampler import RATES_FILE, WEIGHT_COLUMN
+from time_sort import sort_sources, sorted_path, is_fresh, read_windows, window_slice
 
 DIR_ANALYSIS = r"D:\Lyrics-Fanbase-Correlator\Final_Analysis_Results"
 DIR_PROCESSED = r"D:\Lyrics-Fanbase-Correlator\Processed_Artist_Data"
@@ -10,6 +13,8 @@ LYRICS_FILE = r"D:\Lyrics-Fanbase-Correlator\song_level_roberta_vad_fixed.csv"
 
 OUTPUT_DIR = r"D:\Lyrics-Fanbase-Correlator\Event_Study_Results"
 GRAPH_DIR = r"D:\Lyrics-Fanbase-Correlator\Event_Study_Graphs"
+# one time-sorted, deduped file per artist, rebuilt when any input is newer (time_sort.py)
+SORTED_DIR = r"D:\Lyrics-Fanbase-Correlator\Sorted_Artist_Data"
 
 ALBUM_DATES = {
     "Recovery": "2010-06-18", "Music to be Murdered By": "2020-01-17", "The Death of Slim Shady": "2024-07-12",
@@ -72,8 +77,32 @@ def calculate_vad(df):
     df['Dominance'] = df[emotions].dot(d_weights) / prob_sum
     return df
 
+def weighted_welch(x, wx, y, wy):
+    # Welch's t-test with the sampling weights: weighted means, and each
+    # side's variance of the mean scaled by sum(w^2)/sum(w)^2 (the Kish
+    # effective n). With all weights equal this is exactly ttest_ind(equal_var=False).
+    # Needs two rows a side (like ttest_ind), NaN otherwise.
+    if len(x) < 2 or len(y) < 2:
+        return np.nan, np.nan
+    def side(v, w):
+        v, w = np.asarray(v, dtype=float), np.asarray(w, dtype=float)
+        n, sw = len(v), w.sum()
+        mean = (w * v).sum() / sw
+        var = (w * (v - mean) ** 2).sum() / sw * n / (n - 1)
+        n_eff = sw ** 2 / (w ** 2).sum()
+        return mean, var / n_eff, n_eff
+    mx, sx, nx = side(x, wx)
+    my, sy, ny = side(y, wy)
+    se = np.sqrt(sx + sy)
+    if se == 0 or nx <= 1 or ny <= 1:
+        # no spread, or the weights pile onto a single row
+        return np.nan, np.nan
+    t_stat = (mx - my) / se
+    dof = (sx + sy) ** 2 / (sx ** 2 / (nx - 1) + sy ** 2 / (ny - 1))
+    return t_stat, 2 * t_dist.sf(abs(t_stat), dof)
+
 def run_event_study():
-    for d in [OUTPUT_DIR, GRAPH_DIR]:
+    for d in [OUTPUT_DIR, GRAPH_DIR, SORTED_DIR]:
         if not os.path.exists(d): os.makedirs(d)
 
     raw_lyrics = pd.read_csv(LYRICS_FILE)
@@ -84,7 +113,8 @@ def run_event_study():
     if os.path.exists(DIR_ANALYSIS):
         all_files.extend([os.path.join(DIR_ANALYSIS, f) for f in os.listdir(DIR_ANALYSIS) if f.endswith('.csv')])
     if os.path.exists(DIR_PROCESSED):
-        all_files.extend([os.path.join(DIR_PROCESSED, f) for f in os.listdir(DIR_PROCESSED) if f.endswith('.csv')])
+        all_files.extend([os.path.join(DIR_PROCESSED, f) for f in os.listdir(DIR_PROCESSED)
+                          if f.endswith('.csv') and f != RATES_FILE])
 
     artist_files = {}
     for path in all_files:
@@ -109,39 +139,49 @@ def run_event_study():
         album_vad['Release_Date'] = pd.to_datetime(album_vad['Release_Date'])
         album_vad = album_vad.dropna(subset=['Release_Date'])
         
-        merged_reddit = []
-        
+        # Silently only accept files that actually have the GoEmotions columns (and a date)
+        sources = []
         for f in files:
-            df = pd.read_csv(f, low_memory=False, on_bad_lines='skip')
-            
-            date_col = next((c for c in ['Date', 'created_utc', 'timestamp'] if c in df.columns), None)
-            if not date_col: continue
-                
-            df['Date'] = pd.to_datetime(df[date_col], errors='coerce', unit='s' if df[date_col].dtype != 'object' else None)
-            df = df.dropna(subset=['Date'])
-            
-            # Silently only accept files that actually have the GoEmotions columns
-            if 'joy' in df.columns and 'anger' in df.columns:
-                merged_reddit.append(df)
+            cols = pd.read_csv(f, nrows=0).columns
+            if 'joy' in cols and 'anger' in cols and any(c in cols for c in ['Date', 'created_utc', 'timestamp']):
+                sources.append(f)
                 
-        if not merged_reddit:
+        if not sources:
             print(f"   [!] No AI-processed data found for {artist}. Skipping.")
             continue
-            
-        reddit_df = pd.concat(merged_reddit)
+
+        # merge-sort everything for the artist once (bounded memory), then
+        # only read back the rows that fall in an album window
+        sorted_file = sorted_path(SORTED_DIR, artist)
+        if not is_fresh(sorted_file, sources):
+            sort_sources(sources, sorted_file)
+
+        epoch = lambda d: int((d - pd.Timestamp(0)) // pd.Timedelta(seconds=1))
+        span = pd.Timedelta(days=WINDOW_DAYS)
+        windows = [(epoch(d - span), epoch(d + span)) for d in album_vad['Release_Date']]
+        reddit_df = read_windows(sorted_file, windows)
+        reddit_df['Date'] = pd.to_datetime(reddit_df['ts'], unit='s')
         reddit_df = calculate_vad(reddit_df)
 
+        # rows that went through a capped ingestion run (sampler.py) carry
+        # their day's seen/kept, so release-day spikes count at full size;
+        # every other row counts once
+        weighted = False
+        if WEIGHT_COLUMN in reddit_df.columns:
+            reddit_df['Weight'] = pd.to_numeric(reddit_df[WEIGHT_COLUMN], errors='coerce').fillna(1.0)
+            weighted = bool((reddit_df['Weight'] != 1).any())
+            if weighted:
+                print(f"   Reweighting {int((reddit_df['Weight'] != 1).sum())} sampled rows")
+
         album_deltas = []
 
         for _, row in album_vad.iterrows():
             release_date = row['Release_Date']
             album_name = row['Album']
             
-            pre_mask = (reddit_df['Date'] >= release_date - pd.Timedelta(days=WINDOW_DAYS)) & (reddit_df['Date'] < release_date)
-            post_mask = (reddit_df['Date'] >= release_date) & (reddit_df['Date'] <= release_date + pd.Timedelta(days=WINDOW_DAYS))
-            
-            pre_data = reddit_df[pre_mask]
-            post_data = reddit_df[post_mask]
+            # reddit_df is sorted by ts, so each window is a binary search
+            pre_data = window_slice(reddit_df, epoch(release_date - span), epoch(release_date), side_end='left')
+            post_data = window_slice(reddit_df, epoch(release_date), epoch(release_date + span))
             
             # Explicitly print WHY it failed
             if len(pre_data) < MIN_POSTS or len(post_data) < MIN_POSTS:
@@ -152,12 +192,16 @@ def run_event_study():
             
             album_record = {'Artist': artist, 'Album': album_name}
             for dim in ['Valence', 'Arousal', 'Dominance']:
-                pre_mean = pre_data[dim].mean()
-                post_mean = post_data[dim].mean()
+                if weighted:
+                    pre_mean = np.average(pre_data[dim], weights=pre_data['Weight'])
+                    post_mean = np.average(post_data[dim], weights=post_data['Weight'])
+                    t_stat, p_val = weighted_welch(pre_data[dim], pre_data['Weight'], post_data[dim], post_data['Weight'])
+                else:
+                    pre_mean = pre_data[dim].mean()
+                    post_mean = post_data[dim].mean()
+                    t_stat, p_val = ttest_ind(pre_data[dim], post_data[dim], equal_var=False)
                 delta = post_mean - pre_mean
                 
-                t_stat, p_val = ttest_ind(pre_data[dim], post_data[dim], equal_var=False)
-                
                 album_record[f'Pre_{dim}'] = pre_mean
                 album_record[f'Post_{dim}'] = post_mean
                 album_record[f'Delta_{dim}'] = delta
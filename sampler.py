@@ -0,0 +1,106 @@
+import os
+import hashlib
+import heapq
+import pandas as pd
+from table_io import write_table
+
+# Caps how many records per (artist, day) go on to scoring.
+#
+# r/taylorswift on release day is tens of thousands of comments; the event
+# study only needs a few hundred per day to pin down the mean. This keeps the
+# cap_per_day records with the SMALLEST hash(id) in each (artist, day), which
+# is a reservoir sample where the "randomness" comes from the id:
+#   - same input -> same sample, in any order, on any machine
+#   - raising the cap later only ADDS records (old sample is a subset), so an
+#     extended run can reuse everything already scored
+#
+# Each kept record carries its stratum's seen/kept as an extra Sample_Weight
+# column (write_to(..., weighted=True)), which reddit_process keeps through
+# scoring and run_event_study.py weights by. Only rows that came out of the
+# sampler have it; rows from anywhere else count once. The per-stratum
+# numbers also go to a rates file (sampling_rates.csv next to the outputs)
+# for reference.
+
+RATES_FILE = "sampling_rates.csv"
+RATES_HEADER = ['Artist', 'Date', 'Seen', 'Kept', 'Weight']
+WEIGHT_COLUMN = "Sample_Weight"
+
+
+def id_hash(record_id, salt=""):
+    digest = hashlib.blake2b(f"{salt}{record_id}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class StratifiedSampler:
+    """
+    Stands in for a csv writer: writerow() offers a row, write_to() sends
+    the kept rows (in the order they came in) to the real writer.
+
+    stratum_of(row) -> (artist, 'YYYY-MM-DD'), id_of(row) -> record id
+    (rows without an id are hashed on their whole content instead).
+    """
+
+    def __init__(self, cap_per_day, stratum_of, id_of, salt=""):
+        self.cap = cap_per_day
+        self.stratum_of = stratum_of
+        self.id_of = id_of
+        self.salt = salt
+        self.heaps = {}     # stratum -> max-heap of (-hash, seq, row), the cap smallest hashes
+        self.seen = {}
+        self.seq = 0
+
+    def writerow(self, row):
+        key = self.stratum_of(row)
+        self.seen[key] = self.seen.get(key, 0) + 1
+        rid = self.id_of(row)
+        h = id_hash(rid if rid not in (None, "", "csv_import") else repr(row), self.salt)
+        heap = self.heaps.setdefault(key, [])
+        self.seq += 1
+        if len(heap) < self.cap:
+            heapq.heappush(heap, (-h, self.seq, row))
+        elif h < -heap[0][0]:
+            heapq.heapreplace(heap, (-h, self.seq, row))
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def kept(self):
+        rows = [item for heap in self.heaps.values() for item in heap]
+        rows.sort(key=lambda item: item[1])
+        return [row for _, _, row in rows]
+
+    def write_to(self, writer, weighted=False):
+        """Sends the kept rows to writer; weighted appends each row's seen/kept (WEIGHT_COLUMN)."""
+        kept = self.kept()
+        if weighted:
+            kept = [list(row) + [self.seen[key] / len(self.heaps[key])]
+                    for row, key in zip(kept, map(self.stratum_of, kept))]
+        writer.writerows(kept)
+        return len(kept)
+
+    def rates(self):
+        out = []
+        for (artist, day), seen in sorted(self.seen.items()):
+            kept = len(self.heaps.get((artist, day), []))
+            out.append([artist, day, seen, kept, seen / kept if kept else 0.0])
+        return out
+
+
+def save_rates(rates, out_dir):
+    """Replaces the rows for these artists in out_dir/sampling_rates.csv, keeps everyone else's."""
+    path = os.path.join(out_dir, RATES_FILE)
+    new = pd.DataFrame(rates, columns=RATES_HEADER)
+    if os.path.exists(path):
+        old = pd.read_csv(path)
+        old = old[~old['Artist'].isin(set(new['Artist']))]
+        new = pd.concat([old, new], ignore_index=True)
+    write_table(new, path)
+    return path
+
+
+def load_rates(out_dir):
+    path = os.path.join(out_dir, RATES_FILE)
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path)
@@ -0,0 +1,170 @@
+import os
+import time
+import sqlite3
+import hashlib
+import unicodedata
+import numpy as np
+from token_batches import score_bucketed
+
+# Disk cache in front of the emotion classifiers.
+#
+# Copypasta, reposts, the same lyric chunk in two scripts and every rerun
+# after a crash used to go through the transformer again. CachedClassifier
+# wraps a transformers text-classification pipeline and answers from a
+# SQLite file whatever it has already scored:
+#   key   = sha256(model id, model revision, normalized text)
+#   value = the label scores as float32 (28 for GoEmotions, 7 for j-hartmann)
+# Misses (deduped within the call) go to the real pipeline, length-bucketed
+# (token_batches.py), and are written back. Past max_entries the least recently used rows are evicted.
+#
+#   classifier = cached(pipeline("text-classification", model=..., top_k=None))
+#   classifier(texts, truncation=True)    # same output shape as the pipeline
+
+SCORE_CACHE_DB = os.environ.get("SCORE_CACHE_DB", "score_cache.sqlite")
+MAX_ENTRIES = 2_000_000          # ~250 bytes a row with the index
+EVICT_FRACTION = 0.1             # drop this much extra when over the cap, so eviction isn't every call
+LOOKUP_BATCH = 500               # sqlite's default limit on ? params is 999
+
+
+def normalize(text):
+    """The text that's actually scored and hashed: NFC, every run of whitespace (newlines too) cut to one space."""
+    # copypasta mostly comes back re-wrapped or re-indented, not reworded
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+def model_identity(classifier):
+    """(model id, revision) of a pipeline; revision is the hub commit when transformers knows it."""
+    config = getattr(getattr(classifier, "model", None), "config", None)
+    model_id = getattr(config, "_name_or_path", None) or "unknown"
+    revision = getattr(config, "_commit_hash", None) or "unknown"
+    return str(model_id), str(revision)
+
+
+def _key(model_id, revision, text):
+    return hashlib.sha256(f"{model_id}\0{revision}\0{text}".encode('utf-8')).digest()
+
+
+class CachedClassifier:
+    def __init__(self, classifier, db_path=SCORE_CACHE_DB, max_entries=MAX_ENTRIES, model_id=None, revision=None):
+        self.classifier = classifier
+        self.max_entries = max_entries
+        mid, rev = model_identity(classifier)
+        self.model_id = model_id or mid
+        self.revision = revision or rev
+        self.hits = 0
+        self.misses = 0
+        self.labels = None
+
+        d = os.path.dirname(os.path.abspath(db_path))
+        if not os.path.exists(d):
+            os.makedirs(d)
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS models (model TEXT, revision TEXT, labels TEXT, "
+                         "PRIMARY KEY (model, revision))")
+        self._db.execute("CREATE TABLE IF NOT EXISTS scores (key BLOB PRIMARY KEY, vec BLOB, last_used INTEGER)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS scores_lru ON scores (last_used)")
+        self._db.commit()
+        row = self._db.execute("SELECT labels FROM models WHERE model = ? AND revision = ?",
+                               (self.model_id, self.revision)).fetchone()
+        if row:
+            self.labels = row[0].split("\t")
+        self._count = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    # pipeline-ish attributes some callers poke at
+    @property
+    def model(self):
+        return self.classifier.model
+
+    @property
+    def tokenizer(self):
+        return self.classifier.tokenizer
+
+    def _lookup(self, keys):
+        found = {}
+        for i in range(0, len(keys), LOOKUP_BATCH):
+            part = keys[i:i + LOOKUP_BATCH]
+            q = "SELECT key, vec FROM scores WHERE key IN (%s)" % ",".join("?" * len(part))
+            for k, vec in self._db.execute(q, part):
+                found[k] = np.frombuffer(vec, dtype=np.float32)
+        return found
+
+    def _as_result(self, vec):
+        res = [{'label': lbl, 'score': float(s)} for lbl, s in zip(self.labels, vec)]
+        res.sort(key=lambda r: r['score'], reverse=True)
+        return res
+
+    def _remember_labels(self, result):
+        labels = sorted(r['label'] for r in result)
+        if self.labels is None:
+            self.labels = labels
+            self._db.execute("INSERT OR REPLACE INTO models VALUES (?, ?, ?)",
+                             (self.model_id, self.revision, "\t".join(labels)))
+
+    def scores(self, texts, lengths=None, **kwargs):
+        """
+        One list of {'label', 'score'} per text, cached where possible.
+        lengths: token counts of the texts, if the caller already has them.
+        """
+        texts = [normalize(t) for t in texts]
+        keys = [_key(self.model_id, self.revision, t) for t in texts]
+        found = self._lookup(list(set(keys))) if self.labels is not None else {}
+
+        todo, todo_lengths = {}, []
+        for i, (k, t) in enumerate(zip(keys, texts)):
+            if k not in found and k not in todo:
+                todo[k] = t
+                if lengths is not None:
+                    todo_lengths.append(lengths[i])
+        # a repeat inside the same call counts as a hit, it doesn't hit the model either
+        self.misses += len(todo)
+        self.hits += len(keys) - len(todo)
+
+        now = time.time_ns()
+        if todo:
+            results = score_bucketed(self.classifier, list(todo.values()),
+                                     lengths=todo_lengths if lengths is not None else None, **kwargs)
+            rows = []
+            for k, res in zip(todo, results):
+                # single-label pipelines hand back a dict instead of a list
+                res = res if isinstance(res, list) else [res]
+                self._remember_labels(res)
+                by_label = {r['label']: r['score'] for r in res}
+                vec = np.array([by_label.get(lbl, 0.0) for lbl in self.labels], dtype=np.float32)
+                found[k] = vec
+                rows.append((k, vec.tobytes(), now))
+            self._db.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)", rows)
+            self._count += len(rows)
+        hit_keys = [(now, k) for k in set(keys) if k not in todo]
+        if hit_keys:
+            self._db.executemany("UPDATE scores SET last_used = ? WHERE key = ?", hit_keys)
+        if self._count > self.max_entries:
+            self._evict()
+        self._db.commit()
+        return [self._as_result(found[k]) for k in keys]
+
+    def __call__(self, texts, **kwargs):
+        # same shapes as the pipeline: str -> [result], list -> [result, ...]
+        if isinstance(texts, str):
+            return self.scores([texts], **kwargs)
+        return self.scores(list(texts), **kwargs)
+
+    def _evict(self):
+        drop = self._count - int(self.max_entries * (1 - EVICT_FRACTION))
+        self._db.execute("DELETE FROM scores WHERE key IN "
+                         "(SELECT key FROM scores ORDER BY last_used LIMIT ?)", (drop,))
+        self._count = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0.0
+        print(f"   [cache] {self.model_id}@{self.revision[:8]}: {self.hits} hits, {self.misses} misses "
+              f"({rate:.1f}% hit rate), {self._count} entries cached")
+
+    def close(self):
+        self._db.close()
+
+
+def cached(classifier, **kwargs):
+    return CachedClassifier(classifier, **kwargs)
@@ -0,0 +1,343 @@
+import os
+import io
+import csv
+import zstandard as zstd
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# One place that knows the three shapes our CSV-ish outputs come in:
+#   "csv"      plain text, what everything used to write
+#   "csv.zst"  the same CSV inside zstd (5-10x smaller, pandas reads it natively)
+#   "parquet"  columnar, typed, smallest and fastest to load a few columns from
+#
+# Writers pick a format, readers just call read_table() / find_tables() and
+# don't care which one is on disk.
+#
+# RowSink is the writer most scripts want: rows are batched in memory and
+# written in blocks to a temp file next to the output, which only replaces
+# the real file on commit()/close(). A crash leaves the previous version
+# untouched instead of a half-written CSV.
+
+FORMATS = {"csv": ".csv", "csv.zst": ".csv.zst", "parquet": ".parquet"}
+ZSTD_LEVEL = 3
+ROW_GROUP_ROWS = 200_000
+SINK_BATCH_ROWS = 10_000
+
+_ARROW_TYPES = {"int": "int64", "float": "float64", "str": "string"}
+
+
+def table_format(path):
+    name = str(path).lower()
+    for fmt in ("csv.zst", "parquet", "csv"):
+        if name.endswith(FORMATS[fmt]):
+            return fmt
+    return None
+
+
+def table_stem(name):
+    """Kanye_MASTER.csv.zst -> Kanye_MASTER"""
+    fmt = table_format(name)
+    return name[:-len(FORMATS[fmt])] if fmt else name
+
+
+def output_path(stem, fmt="csv"):
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown output format {fmt!r}, pick one of {list(FORMATS)}")
+    return str(stem) + FORMATS[fmt]
+
+
+def is_table(name, endings=(), contains=None):
+    """
+    endings are the old-style suffixes ('_MASTER.csv', '_Filtered.csv'); they
+    match whatever format the file is actually in.
+    """
+    if not table_format(name):
+        return False
+    stem = table_stem(name)
+    if contains and contains.lower() not in stem.lower():
+        return False
+    return not endings or any(stem.endswith(table_stem(e)) for e in endings)
+
+
+def find_tables(directory, endings=(), contains=None):
+    """
+    File names in directory matching is_table(). If the same table is there
+    in more than one format (mid-conversion), only the newest copy counts.
+    """
+    newest = {}
+    for f in os.listdir(directory):
+        if not is_table(f, endings, contains):
+            continue
+        mtime = os.path.getmtime(os.path.join(directory, f))
+        stem = table_stem(f)
+        if stem not in newest or mtime > newest[stem][0]:
+            newest[stem] = (mtime, f)
+    return sorted(f for _, f in newest.values())
+
+
+def read_table(path, usecols=None, **csv_kwargs):
+    """pd.read_csv for any of our formats. csv_kwargs are ignored for parquet."""
+    if table_format(path) == "parquet":
+        return pd.read_parquet(path, columns=list(usecols) if usecols is not None else None)
+    compression = "zstd" if table_format(path) == "csv.zst" else "infer"
+    return pd.read_csv(path, usecols=usecols, compression=compression, **csv_kwargs)
+
+
+def iter_table(path, chunk_rows, **csv_kwargs):
+    """read_table() in DataFrames of up to chunk_rows rows, for files too big to load at once."""
+    if table_format(path) == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+    compression = "zstd" if table_format(path) == "csv.zst" else "infer"
+    yield from pd.read_csv(path, chunksize=chunk_rows, compression=compression, **csv_kwargs)
+
+
+def write_table(df, path):
+    """Writes df over path in path's own format (tmp file + rename)."""
+    fmt = table_format(path) or "csv"
+    tmp = str(path) + ".tmp"
+    if fmt == "parquet":
+        df.to_parquet(tmp, index=False)
+    elif fmt == "csv.zst":
+        df.to_csv(tmp, index=False, compression={"method": "zstd", "level": ZSTD_LEVEL})
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+class RowWriter:
+    """
+    csv.writer-ish sink for the extraction stages.
+
+    csv / csv.zst can be appended to and truncated back to a sync() point:
+    sync() ends the current zstd frame, so the file size it leaves behind is
+    always a valid place to cut (that's what extract.py's checkpoints rely on).
+    parquet buffers rows into row groups and only becomes readable on close(),
+    so it can't be resumed - callers check .resumable.
+
+    types: optional {column: "int" | "float" | "str"} for parquet (default str).
+    """
+
+    def __init__(self, path, header, fmt=None, append=False, types=None, level=ZSTD_LEVEL, **csv_kwargs):
+        self.path = path
+        self.header = list(header)
+        self.fmt = fmt or table_format(path) or "csv"
+        self.resumable = self.fmt != "parquet"
+        self._raw = None
+        self._zw = None
+        self._rows = []
+
+        if self.fmt == "parquet":
+            if pa is None:
+                raise ImportError("parquet output needs pyarrow (pip install pyarrow)")
+            if append:
+                raise ValueError("parquet output can't be appended to")
+            types = types or {}
+            self._schema = pa.schema([(c, pa.type_for_alias(_ARROW_TYPES[types.get(c, "str")]))
+                                      for c in self.header])
+            self._pq = pq.ParquetWriter(path, self._schema, compression="zstd")
+            return
+
+        needs_header = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self._raw = open(path, 'ab' if append else 'wb')
+        if self.fmt == "csv.zst":
+            # appending just starts a new frame; concatenated frames are still one valid .zst
+            self._zw = zstd.ZstdCompressor(level=level).stream_writer(self._raw, closefd=False)
+            self._text = io.TextIOWrapper(self._zw, encoding='utf-8', newline='', write_through=False)
+        else:
+            self._text = io.TextIOWrapper(self._raw, encoding='utf-8', newline='', write_through=False)
+        self._csv = csv.writer(self._text, **csv_kwargs)
+        if needs_header:
+            self._csv.writerow(self.header)
+
+    def writerow(self, row):
+        if self.fmt == "parquet":
+            self._rows.append(row)
+            if len(self._rows) >= ROW_GROUP_ROWS:
+                self._write_group()
+        else:
+            self._csv.writerow(row)
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def _write_group(self):
+        if not self._rows:
+            return
+        cols = list(zip(*self._rows))
+        arrays = [pa.array(list(c), type=f.type, from_pandas=True) if f.type != pa.string()
+                  else pa.array([None if v is None else str(v) for v in c], type=pa.string())
+                  for c, f in zip(cols, self._schema)]
+        self._pq.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+        self._rows = []
+
+    def flush(self):
+        if self.fmt == "parquet":
+            self._write_group()
+            return
+        self._text.flush()
+        if self._zw is not None:
+            self._zw.flush(zstd.FLUSH_FRAME)
+        self._raw.flush()
+
+    def sync(self):
+        """flush() + fsync. Returns the on-disk size, a safe truncation point for csv/csv.zst."""
+        self.flush()
+        if self._raw is None:
+            return os.path.getsize(self.path)
+        os.fsync(self._raw.fileno())
+        return self._raw.tell()
+
+    def close(self):
+        if self.fmt == "parquet":
+            self._write_group()
+            self._pq.close()
+            return
+        self.flush()
+        # detach so closing the wrapper doesn't write an empty trailing frame
+        self._text.detach()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class RowSink:
+    """
+    with RowSink("Kanye_Filtered.csv", HEADER) as out:
+        out.writerow([...])
+    # file appears (atomically) when the block exits without an exception
+
+    append=True keeps what's already in path (new rows go after it).
+    commit() makes what's been written so far durable and keeps the sink
+    open, for long runs that want a usable file after every album/artist.
+    Format follows the extension (.csv / .csv.zst / .parquet); csv_kwargs go
+    to csv.writer (e.g. quoting=csv.QUOTE_ALL).
+
+    A new file is written to a tmp file and renamed into place on the first
+    commit()/close(). From then on (and from the start with append=True) rows
+    go straight onto the end of path, and commit() is just an fsync plus the
+    committed byte size recorded in a small sidecar - so committing after
+    every album costs the new rows, not a copy of the whole file. abort()
+    cuts path back to that size, and so does the next open if a run died
+    between commits. parquet can't be appended to: it's written to the tmp
+    file and only published on close().
+    """
+
+    def __init__(self, path, header, append=False, batch_rows=SINK_BATCH_ROWS, types=None, **csv_kwargs):
+        self.path = str(path)
+        self.header = list(header)
+        self.fmt = table_format(self.path) or "csv"
+        self.batch_rows = batch_rows
+        self.types = types
+        self.csv_kwargs = csv_kwargs
+        self.rows_written = 0
+        d, name = os.path.split(os.path.abspath(self.path))
+        self.tmp = os.path.join(d, f".{name}.tmp")
+        self.mark = os.path.join(d, f".{name}.commit")
+        self._batch = []
+        self._committed = None
+        keep_existing = append and os.path.exists(self.path)
+        if keep_existing and self.fmt == "parquet":
+            raise ValueError("parquet output can't be appended to")
+        if keep_existing:
+            self._recover()
+            self._open_direct()
+        else:
+            self._out = RowWriter(self.tmp, self.header, self.fmt, types=self.types, **self.csv_kwargs)
+
+    def _recover(self):
+        # a run that died after a commit left rows (maybe half a row / frame) past it
+        if not os.path.exists(self.mark):
+            return
+        with open(self.mark, 'r', encoding='utf-8') as f:
+            size = int(f.read().strip() or 0)
+        if os.path.getsize(self.path) > size:
+            print(f"   [sink] {os.path.basename(self.path)}: dropping rows past the last commit")
+            with open(self.path, 'r+b') as f:
+                f.truncate(size)
+        os.remove(self.mark)
+
+    def _open_direct(self):
+        self._out = RowWriter(self.path, self.header, self.fmt, append=True, **self.csv_kwargs)
+        self._set_mark(self._out.sync())
+
+    def _set_mark(self, size):
+        self._committed = size
+        tmp = self.mark + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(size))
+        os.replace(tmp, self.mark)
+
+    def writerow(self, row):
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_rows:
+            self._write_batch()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def _write_batch(self):
+        if self._batch:
+            self._out.writerows(self._batch)
+            self.rows_written += len(self._batch)
+            self._batch = []
+
+    def commit(self):
+        self._write_batch()
+        if self._committed is not None:
+            self._set_mark(self._out.sync())
+        elif self.fmt == "parquet":
+            raise ValueError("parquet output can only be published on close()")
+        else:
+            # first publish of a new file: tmp -> path, then keep appending to path
+            self._out.sync()
+            self._out.close()
+            os.replace(self.tmp, self.path)
+            self._open_direct()
+
+    def close(self):
+        self._write_batch()
+        if self._committed is not None:
+            self._out.sync()
+            self._out.close()
+            os.remove(self.mark)
+            return
+        self._out.sync()
+        self._out.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        """Drops everything since the last commit; path keeps its old contents."""
+        self._batch = []
+        try:
+            self._out.close()
+        finally:
+            if self._committed is not None:
+                with open(self.path, 'r+b') as f:
+                    f.truncate(self._committed)
+                os.remove(self.mark)
+            elif os.path.exists(self.tmp):
+                os.remove(self.tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
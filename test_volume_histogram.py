@@ -0,0 +1,70 @@
+import json
+import random
+import os
+from volume_histogram import build_histogram, load_histogram, exact_count
+
+DAY = 86400
+
+
+def _write_posts(path, stamps):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, ts in enumerate(stamps):
+            body = "[removed]" if i % 7 == 0 else f"post {i}"
+            f.write(json.dumps({"id": str(i), "created_utc": ts, "body": body}) + "\n")
+
+
+def _exact_scan(stamps, start, end, valid_only=True):
+    # what the old scripts did: start <= created_utc <= end over every record
+    return sum(1 for i, ts in enumerate(stamps)
+               if start <= ts <= end and (i % 7 != 0 or not valid_only))
+
+
+def test_midnight_end_counts_only_that_second(tmp_path):
+    origin = 1454198400                      # a midnight
+    stamps = [origin + 3600, origin + DAY - 1, origin + DAY, origin + DAY + 5, origin + DAY + 600]
+    path = str(tmp_path / "sub")
+    _write_posts(path, stamps)
+    hist = build_histogram(path)
+    # the whole day after the end must not leak in
+    assert hist.count(origin, origin + DAY) == _exact_scan(stamps, origin, origin + DAY)
+
+
+def test_aligned_windows_match_exact_scan(tmp_path):
+    rng = random.Random(0)
+    origin = 1368835200
+    stamps = [origin + rng.randrange(0, 10 * DAY) for _ in range(2000)]
+    # pile some onto bucket boundaries, where the off-by-one lived
+    stamps += [origin + d * DAY + off for d in range(10) for off in (-1, 0, 1)]
+    path = str(tmp_path / "sub")
+    _write_posts(path, stamps)
+
+    for bucket, size in (("day", DAY), ("hour", 3600)):
+        hist = load_histogram(path, bucket)
+        bounds = [origin + k * size for k in range(-2, 10 * DAY // size + 3)]
+        for _ in range(300):
+            start, end = sorted(rng.sample(bounds, 2))
+            # album style (midnight + inclusive second) and exclusive style
+            for e in (end, end - 1):
+                for valid_only in (True, False):
+                    assert hist.count(start, e, valid_only) == _exact_scan(stamps, start, e, valid_only), \
+                        (bucket, start, e, valid_only)
+
+
+def test_unaligned_edges_round_to_nearest_bucket(tmp_path):
+    rng = random.Random(1)
+    origin = 1368835200
+    stamps = [origin + rng.randrange(0, 3 * DAY) for _ in range(500)]
+    path = str(tmp_path / "sub")
+    _write_posts(path, stamps)
+    hist = load_histogram(path, "hour")
+    os.remove(path)             # count() must not need the raw file
+    start, end = origin + 3600 + 600, origin + DAY + 2 * 3600 + 2400
+    assert hist.count(start, end) == _exact_scan(stamps, origin + 3600, origin + DAY + 3 * 3600 - 1)
+
+
+def test_exact_count_on_raw_file(tmp_path):
+    origin = 1368835200
+    stamps = [origin + i * 97 for i in range(300)]
+    path = str(tmp_path / "sub")
+    _write_posts(path, stamps)
+    assert exact_count(path, origin + 1000, origin + 9000) == _exact_scan(stamps, origin + 1000, origin + 9000)
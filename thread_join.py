@@ -0,0 +1,188 @@
+import os
+import sys
+import sqlite3
+import tempfile
+from dump_filters import loads, all_created_utc, scrub_authors
+from time_index import find_raw, iter_spans_lines
+from table_io import RowSink
+
+# Puts each comment back in its thread.
+#
+# {prefix}_comments and {prefix}_submissions get processed as two separate
+# streams, so nothing downstream knows a comment was under the "ALBUM
+# ANNOUNCEMENT" post. This is a one-pass hash join on comment.link_id -> t3_<submission id>:
+#   1. build: stream the submissions that can own a comment in the window
+#      (created up to LOOKBACK_DAYS before it) into an id -> (title, flair, created) index
+#   2. probe: stream the comments in the window once, attach the thread fields
+#
+# The index lives in a dict until it passes memory_budget bytes; past that new
+# entries spill to a throwaway SQLite file and lookups check the dict first,
+# then the disk. Comments still come out in file order either way.
+
+MEMORY_BUDGET = 512 * 1024 * 1024
+LOOKBACK_DAYS = 30               # comments on posts older than this come back unmatched
+ENTRY_OVERHEAD = 240             # rough bytes per dict entry on top of the strings
+SPILL_BATCH = 10_000
+
+HEADER = ['id', 'created_utc', 'score', 'body', 'link_id',
+          'thread_title', 'thread_flair', 'thread_created_utc']
+
+
+def thread_id(link_id):
+    """t3_abc123 -> abc123 (link_id always points at the submission)."""
+    if not link_id:
+        return None
+    link_id = str(link_id)
+    return link_id[3:] if link_id.startswith("t3_") else link_id
+
+
+class SubmissionIndex:
+    """id -> (title, flair, created_utc), in memory up to budget_bytes, SQLite past that."""
+
+    def __init__(self, budget_bytes=MEMORY_BUDGET, spill_dir=None):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self.mem = {}
+        self.mem_bytes = 0
+        self.spilled = 0
+        self._db = None
+        self._db_path = None
+        self._pending = []
+
+    def _open_spill(self):
+        fd, self._db_path = tempfile.mkstemp(prefix="thread_join_", suffix=".sqlite", dir=self.spill_dir)
+        os.close(fd)
+        self._db = sqlite3.connect(self._db_path)
+        # scratch data, durability doesn't matter
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE subs (id TEXT PRIMARY KEY, title TEXT, flair TEXT, created INTEGER)")
+        print(f"   [join] submission index past {self.budget_bytes // 1024**2}MB, spilling to {self._db_path}")
+
+    def add(self, sid, title, flair, created):
+        if sid in self.mem:
+            return
+        size = len(sid) + len(title or "") + len(flair or "") + ENTRY_OVERHEAD
+        if self.mem_bytes + size <= self.budget_bytes:
+            self.mem[sid] = (title, flair, created)
+            self.mem_bytes += size
+            return
+        if self._db is None:
+            self._open_spill()
+        self._pending.append((sid, title, flair, created))
+        self.spilled += 1
+        if len(self._pending) >= SPILL_BATCH:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._db.executemany("INSERT OR IGNORE INTO subs VALUES (?, ?, ?, ?)", self._pending)
+            self._db.commit()
+            self._pending = []
+
+    def finish(self):
+        """Call once the build side is done."""
+        if self._db is not None:
+            self._flush()
+
+    def get(self, sid):
+        hit = self.mem.get(sid)
+        if hit is not None or self._db is None:
+            return hit
+        return self._db.execute("SELECT title, flair, created FROM subs WHERE id = ?", (sid,)).fetchone()
+
+    def __len__(self):
+        return len(self.mem) + self.spilled
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            os.remove(self._db_path)
+            self._db = None
+
+
+def _records(path, start_ts, end_ts):
+    """Parsed records with start_ts <= created_utc <= end_ts (index-pruned, prefiltered on bytes)."""
+    for line in iter_spans_lines(path, [(start_ts, end_ts)]):
+        stamps = all_created_utc(line)
+        if stamps and not any(start_ts <= ts <= end_ts for ts in stamps):
+            continue
+        try:
+            data = scrub_authors(loads(line))
+            utc = int(data.get('created_utc') or 0)
+        except Exception:
+            continue
+        if utc and start_ts <= utc <= end_ts:
+            yield data
+
+
+def build_index(submissions_path, start_ts, end_ts, lookback_days=LOOKBACK_DAYS,
+                budget_bytes=MEMORY_BUDGET, spill_dir=None):
+    index = SubmissionIndex(budget_bytes, spill_dir)
+    for data in _records(submissions_path, start_ts - lookback_days * 86400, end_ts):
+        sid = data.get('id')
+        if sid:
+            index.add(str(sid), data.get('title'), data.get('link_flair_text'), int(data['created_utc']))
+    index.finish()
+    return index
+
+
+def join_threads(prefix, raw_dir, start_ts, end_ts, inner=False, lookback_days=LOOKBACK_DAYS,
+                 budget_bytes=MEMORY_BUDGET, spill_dir=None, stats=None):
+    """
+    Yields (comment dict, (title, flair, created_utc) or None) for every
+    comment in [start_ts, end_ts], in file order. inner=True drops comments
+    whose thread isn't in the submissions file / lookback.
+    Pass a dict as stats to get matched/unmatched/index counts back.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(matched=0, unmatched=0, submissions=0, spilled=0)
+
+    comments = find_raw(os.path.join(raw_dir, f"{prefix}_comments"))
+    submissions = find_raw(os.path.join(raw_dir, f"{prefix}_submissions"))
+    if not comments:
+        print(f"   [join] no comments file for {prefix}")
+        return
+
+    if submissions:
+        index = build_index(submissions, start_ts, end_ts, lookback_days, budget_bytes, spill_dir)
+    else:
+        print(f"   [join] no submissions file for {prefix}, every comment is unmatched")
+        index = SubmissionIndex(budget_bytes, spill_dir)
+    stats.update(submissions=len(index), spilled=index.spilled)
+
+    try:
+        for data in _records(comments, start_ts, end_ts):
+            sid = thread_id(data.get('link_id'))
+            thread = index.get(sid) if sid else None
+            if thread is None:
+                stats["unmatched"] += 1
+                if inner:
+                    continue
+            else:
+                stats["matched"] += 1
+            yield data, thread
+    finally:
+        index.close()
+
+
+def write_joined(prefix, raw_dir, start_ts, end_ts, out_file, **kwargs):
+    """join_threads() into a CSV (or .csv.zst / .parquet) through RowSink."""
+    stats = {}
+    with RowSink(out_file, HEADER) as out:
+        for c, thread in join_threads(prefix, raw_dir, start_ts, end_ts, stats=stats, **kwargs):
+            title, flair, created = thread if thread else (None, None, None)
+            out.writerow([c.get('id'), c.get('created_utc'), c.get('score'), c.get('body'),
+                          c.get('link_id'), title, flair, created])
+    print(f"   {prefix}: {stats['matched']} comments matched to a thread, {stats['unmatched']} not "
+          f"({stats['submissions']} submissions indexed, {stats['spilled']} spilled to disk)")
+    return stats
+
+
+if __name__ == "__main__":
+    # python thread_join.py <raw_dir> <prefix> <start_utc> <end_utc> <out.csv>
+    if len(sys.argv) < 6:
+        print("usage: python thread_join.py <raw_dir> <prefix> <start_utc> <end_utc> <out.csv>")
+        sys.exit(1)
+    raw, prefix, start, end, out_path = sys.argv[1:6]
+    write_joined(prefix, raw, int(start), int(end), out_path)
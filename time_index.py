@@ -0,0 +1,402 @@
+import os
+import io
+import sys
+import json
+import random
+import zstandard as zstd
+from dump_filters import loads, all_created_utc, scrub_authors, anonymize_line
+
+# Sparse sidecar index so a one-month query doesn't rescan Kanye_comments
+# from byte 0 every time.
+#
+# The file gets cut into blocks on line boundaries (~BLOCK_BYTES each) and
+# for every block we remember where it starts, how long it is, and the
+# min/max created_utc inside it. Reddit dumps are *nearly* sorted by time,
+# so a window query only touches a handful of blocks. Because we keep the
+# real min/max (not just the first timestamp) the odd out-of-order line
+# still gets found - the index is exact, just coarse.
+#
+# Two kinds of source:
+#   "jsonl"      plain uncompressed JSONL (the raw/ and Processed_Artist_Data files)
+#   "zst-frames" archives written by reencode_seekable(): every block is its
+#                own zstd frame, so we can seek to it and decompress just that
+#
+# A normal single-frame .zst can't be seeked into; those fall back to a full scan.
+#
+# Archives for the raw/ folder can also be written with a trained zstd
+# dictionary (train_dictionary()). Reddit records
+# repeat the same ~80 keys over and over, which a dictionary learns once
+# instead of per frame, so frames can stay small (= cheap seeks) without
+# giving up ratio. The dictionary lives next to the archive as <name>.dict and
+# the index records it as "dict_file"; open_lines() / iter_spans_lines() pick
+# it up by themselves, so readers don't have to know.
+
+BLOCK_BYTES = 4 * 1024 * 1024
+FRAME_BYTES = 4 * 1024 * 1024
+INDEX_SUFFIX = ".tidx"
+INDEX_VERSION = 1
+DICT_SUFFIX = ".dict"
+DICT_BYTES = 112 * 1024
+DICT_SAMPLES = 100_000
+MAX_WINDOW = 2**31           # Pushshift monthlies need the big window
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def index_path(path):
+    return str(path) + INDEX_SUFFIX
+
+
+def _block_stats(lines):
+    stamps = [ts for l in lines for ts in all_created_utc(l)]
+    if not stamps:
+        return None, None
+    return min(stamps), max(stamps)
+
+
+def _save(path, kind, blocks, **extra):
+    st = os.stat(path)
+    meta = {
+        "version": INDEX_VERSION,
+        "kind": kind,
+        "source_size": st.st_size,
+        "source_mtime": int(st.st_mtime),
+        "block_bytes": BLOCK_BYTES,
+        # [offset, length, min_ts, max_ts] - offsets are compressed offsets for zst-frames
+        "blocks": blocks,
+    }
+    meta.update(extra)
+    tmp = index_path(path) + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, index_path(path))
+    return meta
+
+
+def build_jsonl_index(path, block_bytes=BLOCK_BYTES):
+    """One pass over a plain JSONL file, writes <path>.tidx next to it."""
+    blocks = []
+    offset = 0
+    block_start = 0
+    block_lines = []
+    block_size = 0
+
+    with open(path, 'rb') as f:
+        for line in f:
+            block_lines.append(line)
+            block_size += len(line)
+            offset += len(line)
+            if block_size >= block_bytes:
+                lo, hi = _block_stats(block_lines)
+                blocks.append([block_start, block_size, lo, hi])
+                block_start = offset
+                block_lines = []
+                block_size = 0
+        if block_lines:
+            lo, hi = _block_stats(block_lines)
+            blocks.append([block_start, block_size, lo, hi])
+
+    return _save(path, "jsonl", blocks)
+
+
+def read_index_meta(path):
+    """Sidecar contents as-is (no staleness check), or None."""
+    try:
+        with open(index_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+_dicts = {}
+
+
+def load_dictionary(dict_path):
+    dict_path = os.path.abspath(dict_path)
+    if dict_path not in _dicts:
+        with open(dict_path, 'rb') as f:
+            _dicts[dict_path] = zstd.ZstdCompressionDict(f.read())
+    return _dicts[dict_path]
+
+
+def dict_path(path, meta=None):
+    """Where the dictionary an archive was written with lives, or None."""
+    meta = meta if meta is not None else read_index_meta(path)
+    if not meta or not meta.get("dict_file"):
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(path)), meta["dict_file"])
+
+
+def dictionary_for(path, meta=None):
+    dpath = dict_path(path, meta)
+    return load_dictionary(dpath) if dpath else None
+
+
+def decompressor_for(path, meta=None):
+    d = dictionary_for(path, meta)
+    if d is None:
+        return zstd.ZstdDecompressor(max_window_size=MAX_WINDOW)
+    return zstd.ZstdDecompressor(dict_data=d, max_window_size=MAX_WINDOW)
+
+
+def find_raw(path):
+    """path itself, or its re-encoded path + '.zst' archive if only that's left. None if neither."""
+    if os.path.exists(path):
+        return path
+    if os.path.exists(str(path) + ".zst"):
+        return str(path) + ".zst"
+    return None
+
+
+def open_lines(path):
+    """Line iterator over plain or (any) zstd input, in bytes."""
+    f = open(path, 'rb')
+    magic = f.read(4)
+    f.seek(0)
+    if magic == ZSTD_MAGIC:
+        reader = decompressor_for(path).stream_reader(f, closefd=True)
+        return io.BufferedReader(reader, buffer_size=1024 * 1024)
+    return f
+
+
+def train_dictionary(paths, dst, dict_bytes=DICT_BYTES, samples=DICT_SAMPLES, seed=0):
+    """
+    Trains a zstd dictionary on records sampled evenly across paths (plain,
+    .zst or existing archives) and writes it to dst. Reservoir sampling with a
+    fixed seed, so the same inputs always give the same dictionary.
+    """
+    rng = random.Random(seed)
+    reservoir = []
+    seen = 0
+    for p in paths:
+        with open_lines(p) as f:
+            for line in f:
+                seen += 1
+                if len(reservoir) < samples:
+                    reservoir.append(line)
+                else:
+                    j = rng.randrange(seen)
+                    if j < samples:
+                        reservoir[j] = line
+    if not reservoir:
+        raise ValueError("no records to train a dictionary on")
+    d = zstd.train_dictionary(dict_bytes, reservoir)
+    tmp = dst + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(d.as_bytes())
+    os.replace(tmp, dst)
+    _dicts.pop(os.path.abspath(dst), None)
+    print(f"   Trained {len(d.as_bytes()) // 1024}KB dictionary on {len(reservoir)} of {seen} records -> {dst}")
+    return d
+
+
+def make_compressor(level=10, dict_data=None):
+    # no long-distance matching: a match can't reach past its own independent
+    # frame, so at FRAME_BYTES it would only cost time
+    params = zstd.ZstdCompressionParameters.from_level(level, write_content_size=True)
+    if dict_data is None:
+        return zstd.ZstdCompressor(compression_params=params)
+    return zstd.ZstdCompressor(compression_params=params, dict_data=dict_data)
+
+
+def reencode_seekable(src, dst, frame_bytes=FRAME_BYTES, level=10, compressor=None,
+                      dict_file=None, transform=None, anonymize=False):
+    """
+    Rewrites src (plain JSONL or .zst) as a seekable archive: a string of
+    independent zstd frames of ~frame_bytes each, cut on line boundaries.
+    Writes dst + dst.tidx.
+
+    dict_file:     trained dictionary (train_dictionary()) to compress with;
+                   it has to stay next to dst, the index points at it by name
+    transform:     optional line -> line (or None to drop it) applied on the way
+    compressor:    your own ZstdCompressor, overrides level/dict
+    anonymize:     drop the author fields in the same pass (after transform);
+                   the index records it so anonymize.py can skip the archive
+
+    src == dst is fine, the output only replaces src once it's complete.
+    The index records how many lines went in ("lines") and how many the
+    transform dropped ("dropped"), for verify_archive().
+    """
+    extra = {}
+    if anonymize:
+        extra["anonymized"] = True
+        inner = transform
+
+        def transform(line):
+            if inner is not None:
+                line = inner(line)
+            return None if line is None else anonymize_line(line)
+    if dict_file:
+        dst_dir = os.path.dirname(os.path.abspath(dst))
+        extra["dict_file"] = os.path.relpath(os.path.abspath(dict_file), dst_dir)
+    cctx = compressor or make_compressor(level, load_dictionary(dict_file) if dict_file else None)
+    blocks = []
+    comp_offset = 0
+
+    def flush(lines):
+        nonlocal comp_offset
+        if not lines:
+            return
+        frame = cctx.compress(b"".join(lines))
+        out.write(frame)
+        lo, hi = _block_stats(lines)
+        blocks.append([comp_offset, len(frame), lo, hi])
+        comp_offset += len(frame)
+
+    tmp = dst + ".tmp"
+    with open_lines(src) as fin, open(tmp, 'wb') as out:
+        pending = []
+        size = 0
+        written = dropped = 0
+        for line in fin:
+            if transform is not None:
+                line = transform(line)
+                if line is None:
+                    dropped += 1
+                    continue
+            written += 1
+            if not line.endswith(b"\n"):
+                line += b"\n"
+            pending.append(line)
+            size += len(line)
+            if size >= frame_bytes:
+                flush(pending)
+                pending = []
+                size = 0
+        flush(pending)
+    os.replace(tmp, dst)
+    return _save(dst, "zst-frames", blocks, lines=written, dropped=dropped, **extra)
+
+
+def verify_archive(path, meta=None):
+    """True if the archive at path decodes to the line count its index recorded."""
+    meta = meta or read_index_meta(path)
+    if not meta or "lines" not in meta:
+        return False
+    try:
+        with open_lines(path) as f:
+            return sum(1 for _ in f) == meta["lines"]
+    except Exception as e:
+        print(f"   [!] {os.path.basename(path)} doesn't decode: {e}")
+        return False
+
+
+def load_index(path, build=True):
+    """
+    Returns the index for path, (re)building it if it's missing or stale.
+    Returns None for a .zst that isn't a seekable archive.
+    """
+    ipath = index_path(path)
+    if os.path.exists(ipath):
+        with open(ipath, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        st = os.stat(path)
+        if (meta.get("version") == INDEX_VERSION and meta.get("source_size") == st.st_size
+                and meta.get("source_mtime") == int(st.st_mtime)):
+            return meta
+        if meta.get("kind") == "zst-frames":
+            print(f"   [!] {os.path.basename(path)} changed since it was re-encoded, index is stale")
+            return None
+    if not build:
+        return None
+    with open(path, 'rb') as f:
+        if f.read(4) == ZSTD_MAGIC:
+            return None
+    print(f"   Building time index for {os.path.basename(path)}...")
+    return build_jsonl_index(path)
+
+
+def _overlapping(blocks, spans):
+    for off, length, lo, hi in blocks:
+        # no timestamps in the block -> can't rule it out
+        if lo is not None and not any(hi >= start and lo <= end for start, end in spans):
+            continue
+        yield off, length
+
+
+def iter_spans_lines(path, spans, meta=None):
+    """
+    Yields the raw lines (bytes) from every block that can contain any of
+    the (start_ts, end_ts) spans, in file order and each block only once.
+    These are CANDIDATES - the caller still checks each record's real timestamp.
+    """
+    meta = meta if meta is not None else load_index(path)
+    if meta is None:
+        # not indexable, do it the slow way
+        with open_lines(path) as f:
+            yield from f
+        return
+
+    # blocks are a few MB each, so reading one at a time keeps memory flat
+    # even when the window spans most of the file
+    dctx = decompressor_for(path, meta) if meta["kind"] == "zst-frames" else None
+    with open(path, 'rb') as f:
+        for off, length in _overlapping(meta["blocks"], spans):
+            f.seek(off)
+            data = f.read(length)
+            if dctx:
+                data = dctx.decompress(data)
+            yield from data.splitlines(keepends=True)
+
+
+def iter_window_lines(path, start_ts, end_ts, meta=None):
+    """Single-window version of iter_spans_lines()."""
+    return iter_spans_lines(path, [(start_ts, end_ts)], meta)
+
+
+def iter_window_records(path, start_ts, end_ts):
+    """Parsed records with start_ts <= created_utc <= end_ts."""
+    for line in iter_window_lines(path, start_ts, end_ts):
+        stamps = all_created_utc(line)
+        if stamps and not any(start_ts <= ts <= end_ts for ts in stamps):
+            continue
+        try:
+            data = scrub_authors(loads(line))
+            utc = data.get('created_utc')
+            if utc and start_ts <= int(utc) <= end_ts:
+                yield data
+        except Exception:
+            continue
+
+
+if __name__ == "__main__":
+    # python time_index.py <file> [<file> ...]             -> build/refresh sidecars
+    # python time_index.py --reencode <src> <dst.zst>      -> seekable zstd archive
+    # python time_index.py --archive [--delete] <raw_dir> [<file> ...]
+    #     trains raw_dir/raw.dict on the files (first run only), rewrites each one as <file>.zst
+    #     (with the dictionary), author fields dropped on the way. With
+    #     --delete the plain copy (which still has the authors) is removed
+    #     once the archive decodes back to the same line count
+    args = sys.argv[1:]
+    if len(args) == 3 and args[0] == "--reencode":
+        meta = reencode_seekable(args[1], args[2])
+        print(f"Wrote {args[2]} ({len(meta['blocks'])} frames)")
+    elif len(args) >= 2 and args[0] == "--archive":
+        delete = "--delete" in args
+        args = [a for a in args if a != "--delete"]
+        raw_dir = args[1]
+        names = args[2:] or sorted(f for f in os.listdir(raw_dir)
+                                   if os.path.isfile(os.path.join(raw_dir, f)) and "." not in f)
+        paths = [os.path.join(raw_dir, n) for n in names]
+        dict_file = os.path.join(raw_dir, "raw" + DICT_SUFFIX)
+        if not os.path.exists(dict_file):
+            # never retrain over it: the archives already written need this one
+            train_dictionary(paths, dict_file)
+        for p in paths:
+            before = os.path.getsize(p)
+            meta = reencode_seekable(p, p + ".zst", dict_file=dict_file, anonymize=True)
+            after = os.path.getsize(p + ".zst")
+            print(f"{os.path.basename(p)}: {before / 1024**2:.0f}MB -> {after / 1024**2:.0f}MB "
+                  f"({before / max(after, 1):.1f}x, {len(meta['blocks'])} frames, "
+                  f"{meta['dropped']} non-JSON lines dropped)")
+            if not delete:
+                continue
+            if not verify_archive(p + ".zst", meta):
+                print(f"   [!] {os.path.basename(p)}.zst doesn't round-trip, keeping the plain copy")
+                continue
+            os.remove(p)
+            if os.path.exists(index_path(p)):
+                os.remove(index_path(p))
+    else:
+        for p in args:
+            meta = build_jsonl_index(p)
+            print(f"{p}: {len(meta['blocks'])} blocks")
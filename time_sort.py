@@ -0,0 +1,209 @@
+import os
+import sys
+import csv
+import json
+import heapq
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from table_io import RowSink, iter_table, table_format
+from id_set import IdSet, row_key, ID_COLUMNS, TEXT_COLUMNS, BLOOM_CAPACITY
+
+# One time-sorted, deduplicated file per artist, built without loading the
+# sources all at once.
+#
+# The event study used to pd.concat every _FullDist/_MASTER file for an
+# artist and then boolean-mask each album window out of the whole thing. This
+# is a plain external merge sort:
+#   1. runs:  read each source CHUNK_ROWS at a time, give every row a "ts"
+#             (epoch seconds), sort the chunk, spill it to a temp CSV
+#   2. merge: k-way heapq.merge of the runs (MAX_FANIN at a time, extra
+#             passes if there are more), dropping repeated posts on the way
+#             through an id set in the spill dir
+# Memory is one chunk during (1) and one buffered row per run during (2).
+#
+# The result leads with the ts column, so window reads can stream it and stop
+# at the end of the last window (read_windows) and slices of a loaded frame
+# are a binary search (window_slice). Next to it sits a small manifest of the
+# sources it was built from (path, size, mtime); is_fresh() rebuilds when a
+# source is added, removed, swapped or changed.
+
+SORTED_DIRNAME = "Sorted"
+SORTED_SUFFIX = "_Sorted.csv"
+MANIFEST_SUFFIX = ".sources.json"
+CHUNK_ROWS = 500_000
+MAX_FANIN = 64
+READ_CHUNK_ROWS = 200_000
+DATE_COLUMNS = ['Date', 'created_utc', 'timestamp', 'utc', 'created', 'date']
+
+csv.field_size_limit(2 ** 31 - 1)
+
+
+def sorted_path(out_dir, artist):
+    return os.path.join(out_dir, f"{artist.replace(' ', '')}{SORTED_SUFFIX}")
+
+
+def _manifest(sources):
+    entries = []
+    for path in sources:
+        st = os.stat(path)
+        entries.append([os.path.abspath(path), st.st_size, st.st_mtime_ns])
+    return entries
+
+
+def is_fresh(out_path, sources):
+    """True if out_path exists and was built from exactly these sources, unchanged."""
+    manifest = out_path + MANIFEST_SUFFIX
+    if not os.path.exists(out_path) or not os.path.exists(manifest):
+        return False
+    try:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            built_from = json.load(f)
+        return built_from == _manifest(sources)
+    except (OSError, ValueError):
+        return False
+
+
+def to_epoch(col):
+    """Date column (epoch numbers or date strings) -> epoch seconds as float, NaN where unparseable."""
+    if pd.api.types.is_numeric_dtype(col):
+        dates = pd.to_datetime(col, unit='s', errors='coerce')
+    else:
+        dates = pd.to_datetime(col, errors='coerce')
+    return (dates - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+
+
+def _columns(path):
+    return list(next(iter_table(path, 1, low_memory=False)).columns) if table_format(path) else []
+
+
+def _write_run(df, columns, spill_dir, n):
+    path = os.path.join(spill_dir, f"run_{n:05d}.csv")
+    df.sort_values('ts', kind='stable').reindex(columns=columns).to_csv(path, index=False)
+    return path
+
+
+def _read_run(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            yield row
+
+
+def _merge_runs(runs, columns, spill_dir, n):
+    """Merges runs down to MAX_FANIN or fewer, returns the remaining run paths."""
+    while len(runs) > MAX_FANIN:
+        merged = []
+        for i in range(0, len(runs), MAX_FANIN):
+            group = runs[i:i + MAX_FANIN]
+            path = os.path.join(spill_dir, f"run_{n:05d}.csv")
+            n += 1
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                w = csv.writer(f)
+                w.writerow(columns)
+                w.writerows(heapq.merge(*map(_read_run, group), key=lambda r: float(r[0])))
+            for p in group:
+                os.remove(p)
+            merged.append(path)
+        runs = merged
+    return runs
+
+
+def sort_sources(sources, out_path, chunk_rows=CHUNK_ROWS, spill_dir=None, dedupe=True):
+    """
+    Merges sources (any read_table format) into out_path sorted by time.
+    Rows without a parseable date are dropped. Returns (rows written, duplicates dropped).
+    """
+    manifest = out_path + MANIFEST_SUFFIX
+    if os.path.exists(manifest):
+        # out_path is about to change; a crash mid-sort must not look fresh
+        os.remove(manifest)
+    built_from = _manifest(sources)
+    columns = ['ts']
+    for path in sources:
+        columns += [c for c in _columns(path) if c not in columns]
+
+    work = tempfile.mkdtemp(prefix="time_sort_", dir=spill_dir)
+    try:
+        runs = []
+        seen_rows = 0
+        for path in sources:
+            for chunk in iter_table(path, chunk_rows, low_memory=False, on_bad_lines='skip'):
+                date_col = next((c for c in DATE_COLUMNS if c in chunk.columns), None)
+                if not date_col:
+                    print(f"   [sort] no date column in {os.path.basename(path)}, skipping it")
+                    break
+                chunk = chunk.assign(ts=to_epoch(chunk[date_col])).dropna(subset=['ts'])
+                chunk = chunk.assign(ts=chunk['ts'].astype('int64'))
+                if chunk.empty:
+                    continue
+                runs.append(_write_run(chunk, columns, work, len(runs)))
+                seen_rows += len(chunk)
+        print(f"   [sort] {seen_rows} rows from {len(sources)} files in {len(runs)} runs")
+
+        runs = _merge_runs(runs, columns, work, len(runs))
+
+        id_idx = [columns.index(c) for c in ID_COLUMNS if c in columns]
+        text_idx = [columns.index(c) for c in TEXT_COLUMNS if c in columns]
+        written = dropped = 0
+        # the Bloom filter is only a fast "definitely new"; past BLOOM_CAPACITY
+        # the sqlite set keeps it exact, so memory stays flat on big artists
+        capacity = min(max(seen_rows, 1000), BLOOM_CAPACITY)
+        with IdSet(os.path.join(work, "seen.sqlite"), "sort", capacity=capacity) as ids, \
+                RowSink(out_path, columns) as out:
+            for row in heapq.merge(*map(_read_run, runs), key=lambda r: float(r[0])):
+                if dedupe:
+                    rid = next((row[i] for i in id_idx if row[i]), None)
+                    text = next((row[i] for i in text_idx if row[i]), None)
+                    if not ids.add(row_key(rid, text)):
+                        dropped += 1
+                        continue
+                out.writerow(row)
+                written += 1
+        with open(manifest, 'w', encoding='utf-8') as f:
+            json.dump(built_from, f)
+        print(f"   [sort] wrote {written} rows to {os.path.basename(out_path)} ({dropped} duplicates dropped)")
+        return written, dropped
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def read_windows(path, windows, chunk_rows=READ_CHUNK_ROWS, **csv_kwargs):
+    """
+    Rows of a sorted file with start <= ts <= end for any (start, end) in
+    windows (epoch seconds), read in chunks. Stops once it's past the last window.
+    """
+    if not windows:
+        return pd.DataFrame()
+    last_end = max(e for _, e in windows)
+    keep = []
+    for chunk in iter_table(path, chunk_rows, low_memory=False, **csv_kwargs):
+        ts = chunk['ts'].to_numpy()
+        if len(ts) and ts[0] > last_end:
+            break
+        hit = np.zeros(len(chunk), dtype=bool)
+        for s, e in windows:
+            hit[np.searchsorted(ts, s, side='left'):np.searchsorted(ts, e, side='right')] = True
+        if hit.any():
+            keep.append(chunk[hit])
+        if len(ts) and ts[-1] > last_end:
+            break
+    if not keep:
+        return pd.DataFrame(columns=list(next(iter_table(path, 1)).columns))
+    return pd.concat(keep, ignore_index=True)
+
+
+def window_slice(df, start, end, side_end='right'):
+    """Rows of a ts-sorted frame with start <= ts <= end (or < end with side_end='left'), by binary search."""
+    ts = df['ts'].to_numpy()
+    return df.iloc[np.searchsorted(ts, start, side='left'):np.searchsorted(ts, end, side=side_end)]
+
+
+if __name__ == "__main__":
+    # python time_sort.py <out.csv> <source> [<source> ...]
+    if len(sys.argv) < 3:
+        print("usage: python time_sort.py <out.csv> <source> [<source> ...]")
+        sys.exit(1)
+    sort_sources(sys.argv[2:], sys.argv[1])
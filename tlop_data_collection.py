@@ -1,5 +1,6 @@
-import json
 import os
+from volume_histogram import load_histogram
+from time_index import find_raw
 
 RAW_DIR = r"D:\Lyrics-Fanbase-Correlator\Processed_Artist_Data"
 
@@ -14,24 +15,14 @@ TARGETS = [
 ]
 
 def check_kanye_volume():
+    # per-day counts are cached next to the raw file, so this is instant after the first run
     for raw_file, start_utc, end_utc, album_name in TARGETS:
-        input_path = os.path.join(RAW_DIR, raw_file)
-        if not os.path.exists(input_path):
+        # plain file or its .zst archive
+        input_path = find_raw(os.path.join(RAW_DIR, raw_file))
+        if input_path is None:
             continue
-            
-        found_count = 0
-        with open(input_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    data = json.loads(line)
-                    utc = data.get('created_utc')
-                    if utc and start_utc <= int(utc) <= end_utc:
-                        text = data.get('body') or data.get('selftext') or data.get('title') or ""
-                        if text not in ['[removed]', '[deleted]', '']:
-                            found_count += 1
-                except Exception:
-                    continue
-        print(f"{album_name} ({raw_file}): Found {found_count} valid posts")
+        hist = load_histogram(input_path)
+        print(f"{album_name} ({raw_file}): Found {hist.count(start_utc, end_utc)} valid posts")
 
 if __name__ == "__main__":
     check_kanye_volume()
\ No newline at end of file
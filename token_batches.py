@@ -0,0 +1,65 @@
+import numpy as np
+
+# Length-bucketed batching for the transformer pipelines.
+#
+# A batch is padded to its longest text, so a 3-word comment batched with a
+# 500-token rant costs 500 tokens. Here every text is tokenized once up
+# front, the texts are ordered by length, and batches are cut so that
+# rows * longest row stays under token_budget: short comments go through in
+# big batches, long posts in small ones, and almost nothing is padding.
+# Results are put back in the caller's order.
+#
+#   results = score_bucketed(classifier, texts, truncation=True, max_length=512)
+
+TOKEN_BUDGET = 8192          # padded tokens per forward pass; fine for a CPU box, raise on a GPU
+MAX_BATCH_ROWS = 256
+MAX_LENGTH = 512
+
+
+def token_lengths(tokenizer, texts, max_length=MAX_LENGTH):
+    """Token count of each text as the model will see it (special tokens in, truncated)."""
+    if tokenizer is None:
+        # no tokenizer to ask: words are a decent stand-in for ordering
+        return np.array([min(len(str(t).split()) + 2, max_length) for t in texts])
+    enc = tokenizer(list(texts), truncation=True, max_length=max_length, add_special_tokens=True)
+    return np.array([len(ids) for ids in enc['input_ids']])
+
+
+def plan_batches(lengths, token_budget=TOKEN_BUDGET, max_rows=MAX_BATCH_ROWS):
+    """
+    Index lists, shortest texts first, each batch within token_budget padded
+    tokens (a single text over budget still gets a batch of its own).
+    """
+    order = np.argsort(lengths, kind='stable')
+    batches, current, longest = [], [], 0
+    for i in order:
+        n = int(lengths[i])
+        if current and (max(longest, n) * (len(current) + 1) > token_budget or len(current) >= max_rows):
+            batches.append(current)
+            current, longest = [], 0
+        current.append(int(i))
+        longest = max(longest, n)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def score_bucketed(classifier, texts, token_budget=TOKEN_BUDGET, max_rows=MAX_BATCH_ROWS, lengths=None, **kwargs):
+    """
+    classifier(texts, **kwargs), batched by length. Same output, same order.
+    Pass lengths when the token counts are already known (token_windows.py).
+    """
+    texts = list(texts)
+    kwargs.pop("batch_size", None)
+    if not texts:
+        return []
+    if lengths is None:
+        tokenizer = getattr(classifier, "tokenizer", None)
+        max_length = kwargs.get("max_length") or min(getattr(tokenizer, "model_max_length", MAX_LENGTH), MAX_LENGTH)
+        lengths = token_lengths(tokenizer, texts, max_length)
+    results = [None] * len(texts)
+    for batch in plan_batches(lengths, token_budget, max_rows):
+        out = classifier([texts[i] for i in batch], batch_size=len(batch), **kwargs)
+        for i, res in zip(batch, out):
+            results[i] = res
+    return results
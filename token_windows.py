@@ -0,0 +1,138 @@
+import re
+import numpy as np
+from token_batches import score_bucketed, MAX_LENGTH
+
+# Sliding-window chunking on tokens instead of characters.
+#
+# Lyrics used to be cut every 512 characters (anything from ~100 to ~200
+# tokens, split mid-word) and reddit text was cut at 2000 characters and
+# then truncated by the tokenizer, silently losing the rest of long posts.
+# Here each text is tokenized once, cut into windows of `window` tokens
+# every `stride` tokens, and each window is mapped back to a slice of the
+# original string through the tokenizer's offsets (so windows start and
+# end on token boundaries). The last window is pulled back to end at the
+# end of the text rather than leaving a tiny tail window, so every token is
+# covered with the fewest windows. The token count of every window is known
+# exactly and goes straight into the batch planner.
+#
+#   results, counts = score_windows(classifier, texts)
+#   # results[i]: label scores averaged over text i's windows (pipeline shape)
+#   # counts[i]:  how many windows text i needed
+
+WINDOW = None          # tokens per window; None = the model limit minus special tokens
+STRIDE = None          # None = same as the window, i.e. no overlap
+MIN_TOKENS = 0         # texts with fewer tokens get no window (0 = always score, even empty text)
+
+_WORD_RE = re.compile(r'\S+')
+
+
+def _special_count(tokenizer):
+    try:
+        return tokenizer.num_special_tokens_to_add()
+    except Exception:
+        return 2
+
+
+def default_window(tokenizer):
+    """Largest window that fits the model once special tokens are added."""
+    if tokenizer is None:
+        return MAX_LENGTH - 2
+    return min(getattr(tokenizer, "model_max_length", MAX_LENGTH), MAX_LENGTH) - _special_count(tokenizer)
+
+
+def token_offsets(tokenizer, texts):
+    """(start, end) character span of every token of every text."""
+    texts = [str(t) for t in texts]
+    if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+        enc = tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True)
+        return [[(s, e) for s, e in offs if e > s] for offs in enc['offset_mapping']]
+    # slow or no tokenizer: whitespace words stand in for tokens
+    return [[m.span() for m in _WORD_RE.finditer(t)] for t in texts]
+
+
+def window_spans(n_tokens, window, stride=None):
+    """
+    (start, end) token ranges covering n_tokens. No window is contained in
+    the one before it: a short tail becomes a full window ending at the end.
+    """
+    stride = stride or window
+    if n_tokens <= window:
+        return [(0, n_tokens)]
+    starts = list(range(0, n_tokens - window + 1, stride))
+    if starts[-1] + window < n_tokens:
+        starts.append(n_tokens - window)
+    return [(s, s + window) for s in starts]
+
+
+def split_windows(tokenizer, texts, window=WINDOW, stride=STRIDE, min_tokens=MIN_TOKENS):
+    """
+    Cut texts into token windows. Returns (chunks, owner, lengths, counts):
+    the window strings, the index of the text each came from, each window's
+    exact length in model tokens (special tokens included) and the number of
+    windows per text.
+    """
+    texts = [str(t) for t in texts]
+    window = window or default_window(tokenizer)
+    extra = _special_count(tokenizer) if tokenizer is not None else 2
+    chunks, owner, lengths = [], [], []
+    counts = np.zeros(len(texts), dtype=int)
+    for i, (text, offs) in enumerate(zip(texts, token_offsets(tokenizer, texts))):
+        if len(offs) < min_tokens:
+            continue
+        if not offs:
+            # nothing to cut (empty / whitespace), but the caller still wants a score for it
+            chunks.append(text); owner.append(i); lengths.append(extra); counts[i] = 1
+            continue
+        spans = window_spans(len(offs), window, stride)
+        for s, e in spans:
+            chunks.append(text[offs[s][0]:offs[e - 1][1]])
+            owner.append(i)
+            lengths.append(e - s + extra)
+        counts[i] = len(spans)
+    return chunks, owner, lengths, counts
+
+
+def score_windows(classifier, texts, window=WINDOW, stride=STRIDE, min_tokens=MIN_TOKENS, **kwargs):
+    """
+    classifier over every window of every text, in one length-bucketed pass.
+    Returns (results, counts): one list of {'label', 'score'} per text with the
+    scores averaged over its windows (None if it got no window), and the
+    windows per text.
+    """
+    texts = list(texts)
+    tokenizer = getattr(classifier, "tokenizer", None)
+    window = window or default_window(tokenizer)
+    chunks, owner, lengths, counts = split_windows(tokenizer, texts, window, stride, min_tokens)
+    results = [None] * len(texts)
+    if not chunks:
+        return results, counts
+
+    # windows fit by construction; truncation only guards against a slice
+    # re-tokenizing a token or two longer than it was cut
+    kwargs.setdefault("truncation", True)
+    kwargs.setdefault("max_length", window + (_special_count(tokenizer) if tokenizer is not None else 2))
+    if hasattr(classifier, "scores"):
+        out = classifier.scores(chunks, lengths=lengths, **kwargs)
+    else:
+        out = score_bucketed(classifier, chunks, lengths=lengths, **kwargs)
+    out = [r if isinstance(r, list) else [r] for r in out]
+
+    labels = sorted({r['label'] for res in out for r in res})
+    col = {lbl: j for j, lbl in enumerate(labels)}
+    probs = np.zeros((len(out), len(labels)))
+    for row, res in enumerate(out):
+        for r in res:
+            probs[row, col[r['label']]] = r['score']
+    sums = np.zeros((len(texts), len(labels)))
+    np.add.at(sums, np.array(owner), probs)
+
+    for i in np.flatnonzero(counts):
+        mean = sums[i] / counts[i]
+        res = [{'label': lbl, 'score': float(s)} for lbl, s in zip(labels, mean)]
+        res.sort(key=lambda r: r['score'], reverse=True)
+        results[i] = res
+
+    split = int((counts > 1).sum())
+    if split:
+        print(f"   [windows] {len(texts)} texts -> {len(chunks)} windows ({split} long texts split, max {counts.max()})")
+    return results, counts
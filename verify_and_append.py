@@ -1,7 +1,8 @@
-import json
 import os
 import pandas as pd
 from datetime import datetime
+from window_query import extract_targets, post_text
+from time_index import find_raw
 
 RAW_DIR = r"D:\Lyrics-Fanbase-Correlator\Processed_Artist_Data"
 
@@ -22,17 +23,27 @@ TARGETS = {
 }
 
 def scan_and_append():
+    queries = []
     for raw_file, (start_utc, end_utc, target_file) in TARGETS.items():
-        input_path = os.path.join(RAW_DIR, raw_file)
         target_path = os.path.join(RAW_DIR, target_file)
         
-        if not os.path.exists(input_path):
+        # plain file or its .zst archive
+        if find_raw(os.path.join(RAW_DIR, raw_file)) is None:
             print(f"skipping {raw_file}, file not found")
             continue
             
         if not os.path.exists(target_path):
             print(f"target file {target_file} not found. cannot append to it. skipping.")
             continue
+        
+        queries.append((raw_file, start_utc, end_utc, target_file))
+    
+    print("scanning raw files for valid 2010/2011 dates...")
+    found = extract_targets(queries, RAW_DIR)
+    
+    for query in queries:
+        raw_file, start_utc, end_utc, target_file = query
+        target_path = os.path.join(RAW_DIR, target_file)
             
         # read the exact columns from the target file so we don't misalign data
         target_df = pd.read_csv(target_path, nrows=0)
@@ -41,49 +52,35 @@ def scan_and_append():
         # lower case columns for flexible matching
         col_map_lower = {c.lower(): c for c in target_columns}
         
-        print(f"scanning {raw_file} for valid 2010/2011 dates...")
         valid_records = []
         
-        with open(input_path, 'r', encoding='utf-8') as f_in:
-            for line in f_in:
-                try:
-                    data = json.loads(line)
-                    utc_val = data.get('created_utc')
-                    
-                    if utc_val:
-                        utc_int = int(utc_val)
-                        
-                        # if the post falls exactly in the album hype window, save it
-                        if start_utc <= utc_int <= end_utc:
-                            text = data.get('body') or data.get('selftext') or data.get('title') or ""
-                            author = data.get('author', '[deleted]')
-                            score = data.get('score', 0)
-                            
-                            if text not in ['[removed]', '[deleted]', '']:
-                                row_data = {}
-                                
-                                # dynamically map the parsed data to the existing csv columns
-                                date_str = datetime.utcfromtimestamp(utc_int).strftime('%Y-%m-%d %H:%M:%S')
-                                if 'date' in col_map_lower: 
-                                    row_data[col_map_lower['date']] = date_str
-                                elif 'utc' in col_map_lower: 
-                                    row_data[col_map_lower['utc']] = utc_int
-                                elif 'created_utc' in col_map_lower: 
-                                    row_data[col_map_lower['created_utc']] = utc_int
-                                    
-                                if 'text' in col_map_lower: 
-                                    row_data[col_map_lower['text']] = text
-                                elif 'body' in col_map_lower: 
-                                    row_data[col_map_lower['body']] = text
-                                    
-                                if 'score' in col_map_lower: 
-                                    row_data[col_map_lower['score']] = score
-                                if 'author' in col_map_lower: 
-                                    row_data[col_map_lower['author']] = author
-                                    
-                                valid_records.append(row_data)
-                except Exception:
-                    continue
+        for data in found[query]:
+            utc_int = int(data.get('created_utc'))
+            text = post_text(data)
+            score = data.get('score', 0)
+            
+            row_data = {}
+            
+            # dynamically map the parsed data to the existing csv columns
+            date_str = datetime.utcfromtimestamp(utc_int).strftime('%Y-%m-%d %H:%M:%S')
+            if 'date' in col_map_lower: 
+                row_data[col_map_lower['date']] = date_str
+            elif 'utc' in col_map_lower: 
+                row_data[col_map_lower['utc']] = utc_int
+            elif 'created_utc' in col_map_lower: 
+                row_data[col_map_lower['created_utc']] = utc_int
+                
+            if 'text' in col_map_lower: 
+                row_data[col_map_lower['text']] = text
+            elif 'body' in col_map_lower: 
+                row_data[col_map_lower['body']] = text
+                
+            if 'score' in col_map_lower: 
+                row_data[col_map_lower['score']] = score
+            # records come back with authors scrubbed, so an author column
+            # is left empty below rather than filled with a made-up value
+                
+            valid_records.append(row_data)
         
         if valid_records:
             append_df = pd.DataFrame(valid_records)
@@ -0,0 +1,191 @@
+import os
+import re
+import sys
+import numpy as np
+from dump_filters import loads, all_created_utc
+from time_index import open_lines, iter_window_lines
+from window_query import is_valid_post
+
+# Counts-only mode for the "is there enough data in this album window?"
+# questions. One pass over a subreddit file pulls just created_utc (regex,
+# no json) plus a removed/deleted flag and drops them into per-day (or
+# per-hour) buckets. The result is a tiny array saved next to the file, so
+# every later volume check is a cumsum lookup instead of a rescan.
+#
+# count(start, end) never touches the raw file. Windows whose edges sit on
+# bucket boundaries are exact for the inclusive [start, end], same as the old
+# `start <= created_utc <= end` scans - that's every album window here,
+# which start at midnight and end at midnight plus the inclusive second (the
+# histogram keeps a count of the first second of each bucket for exactly
+# that). Any other edge is rounded to the nearest bucket boundary, so an
+# unaligned window can be off by up to half a bucket at each end; use
+# exact_count() (a seek through the time index) when that matters.
+# series() is for plotting and only returns the whole buckets.
+
+BUCKETS = {"day": 86400, "hour": 3600}
+HIST_SUFFIX = ".vhist.npz"
+
+# Lines that *might* be removed/deleted/empty. Only these get json-decoded to
+# confirm (crosspost parents can carry their own "[removed]" selftext), so the
+# valid counts match the old is_valid_post() checks exactly.
+_MAYBE_REMOVED = re.compile(rb'"(?:body|selftext|title)":\s*"(?:\[removed\]|\[deleted\]|)"')
+
+
+def _classify(line):
+    """(created_utc, is_valid) for one raw line, or None if it has no timestamp."""
+    stamps = all_created_utc(line)
+    if len(stamps) == 1 and not _MAYBE_REMOVED.search(line):
+        return stamps[0], True
+    if not stamps:
+        # the old scripts skip records without created_utc too
+        return None
+    # crosspost or possibly-removed: let the real parser decide
+    try:
+        data = loads(line)
+        ts = int(data.get('created_utc') or 0)
+        return (ts, is_valid_post(data)) if ts else None
+    except Exception:
+        return None
+
+
+def exact_count(path, start_ts, end_ts, valid_only=True):
+    """Posts with start_ts <= created_utc <= end_ts, from the raw records."""
+    n = 0
+    for line in iter_window_lines(path, start_ts, end_ts):
+        hit = _classify(line)
+        if hit and start_ts <= hit[0] <= end_ts and (hit[1] or not valid_only):
+            n += 1
+    return n
+
+
+class VolumeHistogram:
+    def __init__(self, origin, bucket_seconds, total, valid, head_total=None, head_valid=None):
+        self.origin = int(origin)               # bucket number of total[0]
+        self.bucket_seconds = int(bucket_seconds)
+        self.total = np.asarray(total, dtype=np.int64)
+        self.valid = np.asarray(valid, dtype=np.int64)
+        # posts stamped at the very first second of each bucket
+        self.head_total = np.zeros_like(self.total) if head_total is None else np.asarray(head_total, dtype=np.int64)
+        self.head_valid = np.zeros_like(self.valid) if head_valid is None else np.asarray(head_valid, dtype=np.int64)
+        self._cum_total = np.concatenate([[0], np.cumsum(self.total)])
+        self._cum_valid = np.concatenate([[0], np.cumsum(self.valid)])
+
+    def _whole(self, start_ts, end_ts):
+        # bucket numbers [first, last) lying entirely inside [start_ts, end_ts]
+        size = self.bucket_seconds
+        first = -(-int(start_ts) // size)
+        last = (int(end_ts) + 1) // size
+        return first, max(first, last)
+
+    def _slice(self, first, last):
+        lo = min(max(first - self.origin, 0), len(self.total))
+        hi = min(max(last - self.origin, 0), len(self.total))
+        return lo, max(lo, hi)
+
+    def count(self, start_ts, end_ts, valid_only=True):
+        """Posts with start_ts <= created_utc <= end_ts (edge rounding: see the top of the file)."""
+        start_ts, end_ts = int(start_ts), int(end_ts)
+        if end_ts < start_ts:
+            return 0
+        size = self.bucket_seconds
+        first = (start_ts + size // 2) // size
+        head = None
+        if end_ts % size == 0:
+            # inclusive end on a boundary: whole buckets up to it, plus its first second
+            last, head = end_ts // size, end_ts // size
+        else:
+            last = (end_ts + 1 + size // 2) // size
+        lo, hi = self._slice(first, last)
+        cum = self._cum_valid if valid_only else self._cum_total
+        n = int(cum[hi] - cum[lo])
+        if head is not None and head >= first and 0 <= head - self.origin < len(self.total):
+            n += int((self.head_valid if valid_only else self.head_total)[head - self.origin])
+        return n
+
+    def series(self, start_ts, end_ts, valid_only=True):
+        """(bucket_start_ts array, counts array) of the whole buckets inside a window, for plotting."""
+        lo, hi = self._slice(*self._whole(start_ts, end_ts))
+        starts = (np.arange(lo, hi) + self.origin) * self.bucket_seconds
+        counts = (self.valid if valid_only else self.total)[lo:hi]
+        return starts, counts
+
+    def save(self, path, source_size, source_mtime):
+        np.savez(path, origin=self.origin, bucket_seconds=self.bucket_seconds,
+                 total=self.total, valid=self.valid,
+                 head_total=self.head_total, head_valid=self.head_valid,
+                 source_size=source_size, source_mtime=source_mtime)
+
+
+def build_histogram(path, bucket="day"):
+    """One pass over a raw JSONL (or .zst) subreddit file."""
+    size = BUCKETS[bucket]
+    totals = {}
+    valids = {}
+    heads = {}
+    head_valids = {}
+    lines = 0
+
+    with open_lines(path) as f:
+        for line in f:
+            lines += 1
+            hit = _classify(line)
+            if hit is None:
+                continue
+            ts, ok = hit
+
+            b = ts // size
+            totals[b] = totals.get(b, 0) + 1
+            if ok:
+                valids[b] = valids.get(b, 0) + 1
+            if ts % size == 0:
+                heads[b] = heads.get(b, 0) + 1
+                if ok:
+                    head_valids[b] = head_valids.get(b, 0) + 1
+
+            if lines % 5_000_000 == 0:
+                print(f"   ... {os.path.basename(path)}: {lines // 1_000_000}M lines")
+
+    if not totals:
+        return VolumeHistogram(0, size, [], [])
+    origin = min(totals)
+    n = max(totals) - origin + 1
+    arrays = []
+    for counts in (totals, valids, heads, head_valids):
+        arr = np.zeros(n, dtype=np.int64)
+        for b, c in counts.items():
+            arr[b - origin] = c
+        arrays.append(arr)
+    return VolumeHistogram(origin, size, *arrays)
+
+
+def hist_path(path, bucket="day"):
+    return f"{path}.{bucket}{HIST_SUFFIX}"
+
+
+def load_histogram(path, bucket="day", build=True):
+    """Cached histogram for path; rebuilt when the source file changes."""
+    hpath = hist_path(path, bucket)
+    st = os.stat(path)
+    if os.path.exists(hpath):
+        with np.load(hpath) as z:
+            # files from before the head counts get rebuilt
+            if ("head_total" in z.files and int(z["source_size"]) == st.st_size
+                    and int(z["source_mtime"]) == int(st.st_mtime)):
+                return VolumeHistogram(int(z["origin"]), int(z["bucket_seconds"]), z["total"], z["valid"],
+                                       z["head_total"], z["head_valid"])
+    if not build:
+        return None
+    print(f"   Building {bucket} histogram for {os.path.basename(path)}...")
+    hist = build_histogram(path, bucket)
+    hist.save(hpath, st.st_size, int(st.st_mtime))
+    return hist
+
+
+if __name__ == "__main__":
+    # python volume_histogram.py <file> [day|hour]
+    if len(sys.argv) < 2:
+        print("usage: python volume_histogram.py <file> [day|hour]")
+        sys.exit(1)
+    bucket = sys.argv[2] if len(sys.argv) > 2 else "day"
+    h = load_histogram(sys.argv[1], bucket)
+    print(f"{len(h.total)} {bucket} buckets, {int(h.total.sum())} posts ({int(h.valid.sum())} valid)")
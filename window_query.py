@@ -0,0 +1,142 @@
+import os
+from collections import defaultdict
+from dump_filters import loads, all_created_utc, scrub_authors
+from release_windows import WindowIndex
+from time_index import iter_spans_lines, find_raw
+
+# One scanner for every "pull album window X out of raw file Y" script.
+#
+# Targets are (file, start_utc, end_utc, label) tuples, exactly the TARGETS
+# lists the old scripts already had. We group them by file and answer every
+# target for that file in ONE pass (only over the blocks the .tidx index says
+# can overlap any of them). Overlapping targets are fine - a record that sits
+# in two windows counts for both. Targets asking for the same window of the
+# same file (repeats, or the same range under two labels) share one index
+# entry and each get the full result.
+#
+# If raw_dir has an up to date parquet_store/ (see parquet_store.py) the file
+# is read from there instead - only the time range's month partitions and
+# only the columns we need.
+
+REMOVED_TEXT = ['[removed]', '[deleted]', '']
+
+
+def post_text(data):
+    return data.get('body') or data.get('selftext') or data.get('title') or ""
+
+
+def is_valid_post(data):
+    """The check every volume script was doing by hand."""
+    return post_text(data) not in REMOVED_TEXT
+
+
+def _store_is_fresh(store, input_path):
+    if not store or not os.path.isdir(store):
+        return False
+    try:
+        from parquet_store import is_fresh
+    except ImportError:
+        return False
+    return is_fresh(store, input_path)
+
+
+def _store_records(store, raw_file, file_targets, mode):
+    # imported here so the text path still works without pyarrow
+    from parquet_store import iter_spans_records
+    cols = ["created_utc", "body", "selftext", "title"] if mode == "count" else None
+    spans = [(int(t[1]), int(t[2])) for t in file_targets]
+    return iter_spans_records(store, spans, raw_file, columns=cols)
+
+
+def query_targets(targets, raw_dir="", mode="count", keep=is_valid_post, store=None):
+    """
+    targets: list of (file, start_utc, end_utc, label)
+    mode:    "count"   -> {target: int}
+             "records" -> {target: [parsed dict, ...]} in file order
+    keep:    per-record filter applied after the time check (None = keep all)
+
+    store:   parquet store dir, defaults to raw_dir/parquet_store if it exists.
+             Records read from it come back in time order, not file order,
+             and only carry the stored columns.
+
+    Targets whose file is missing come back as 0 / [] so callers can still
+    print them. Repeated targets are answered once (and counted once).
+    """
+    if mode not in ("count", "records"):
+        raise ValueError(f"mode must be 'count' or 'records', got {mode!r}")
+
+    targets = list(dict.fromkeys(tuple(t) for t in targets))
+
+    # one window per distinct (file, start, end); every target asking for it
+    # gets its result afterwards
+    by_file = defaultdict(lambda: defaultdict(list))
+    for t in targets:
+        by_file[t[0]][(int(t[1]), int(t[2]))].append(t)
+
+    if store is None:
+        store = os.path.join(raw_dir, "parquet_store")
+
+    window_results = {}
+    for raw_file, windows in by_file.items():
+        # plain file, or its dictionary-compressed .zst archive
+        input_path = find_raw(os.path.join(raw_dir, raw_file)) or os.path.join(raw_dir, raw_file)
+        file_targets = [ts[0] for ts in windows.values()]
+        for t in file_targets:
+            window_results[t] = 0 if mode == "count" else []
+        index = WindowIndex([{"album": t[3], "start_ts": int(t[1]), "end_ts": int(t[2]), "target": t}
+                             for t in file_targets])
+
+        if _store_is_fresh(store, input_path):
+            for data in _store_records(store, raw_file, file_targets, mode):
+                hits = index.lookup_windows(data['created_utc'])
+                if not hits or (keep and not keep(data)):
+                    continue
+                for w in hits:
+                    if mode == "count":
+                        window_results[w["target"]] += 1
+                    else:
+                        window_results[w["target"]].append(data)
+            continue
+
+        if not os.path.exists(input_path):
+            continue
+
+        spans = [(int(t[1]), int(t[2])) for t in file_targets]
+        for line in iter_spans_lines(input_path, spans):
+            # cheap reject before decoding
+            stamps = all_created_utc(line)
+            if stamps and not any(index.contains(ts) for ts in stamps):
+                continue
+            try:
+                data = scrub_authors(loads(line))
+                utc = data.get('created_utc')
+                if not utc:
+                    continue
+                hits = index.lookup_windows(int(utc))
+                if not hits or (keep and not keep(data)):
+                    continue
+            except Exception:
+                continue
+
+            for w in hits:
+                if mode == "count":
+                    window_results[w["target"]] += 1
+                else:
+                    window_results[w["target"]].append(data)
+
+    # fan the per-window results back out to every target that asked
+    results = {}
+    for windows in by_file.values():
+        for same in windows.values():
+            for t in same:
+                res = window_results[same[0]]
+                results[t] = res if mode == "count" else list(res)
+    return results
+
+
+def count_targets(targets, raw_dir="", store=None):
+    return query_targets(targets, raw_dir, mode="count", store=store)
+
+
+def extract_targets(targets, raw_dir="", keep=is_valid_post, store=None):
+    return query_targets(targets, raw_dir, mode="records", keep=keep, store=store)